@@ -1,13 +1,37 @@
+import argparse
+import bisect
 import collections
+import contextlib
+import hashlib
+import itertools
+import pickle
+import random
+import socket
+import sqlite3
+import re
+import sys
+import threading
+import time
+import uuid
 import requests
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 import lxml.etree as ETREE
 import glob
+import json
 import os
 import logging
 import math
+import multiprocessing
+import operator
 from typing import Dict, List, Any, Optional, Set
-from datetime import datetime
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+from openpyxl import Workbook
 from openpyxl.utils import column_index_from_string
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from dotenv import load_dotenv
@@ -19,9 +43,15 @@ GREEN = '38761D'
 RED = '990000'
 GRAY = '00C0C0C0'
 
-# define alphabet for case-insensitive search
-UPPER_ABC = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-LOWER_ABC = 'abcdefghijklmnopqrstuvwxyz'
+# case-insensitive matching in rule XPaths: ci:equals(), ci:contains(), ci:starts-with()
+CI_NAMESPACE = 'urn:gwinnett:codeplug-checker:case-insensitive'
+XPATH_NAMESPACES = {'ci': CI_NAMESPACE}
+CI_MATCHERS = {
+    'equals': operator.eq,
+    'contains': operator.contains,
+    'starts-with': str.startswith,
+}
+FOLDED_KEYS_MAX = 100_000 # distinct ReferenceKeys/Names to keep folded
 
 # Basic logging to print messages to the console
 logging.basicConfig(
@@ -113,6 +143,9 @@ class TeamDynamixSandboxClient:
             logging.error(f"An unexpected error occurred while fetching details for asset ID {asset_id}: {e}")
             return None
 
+# Optional keys limit where a group applies, by the model and type from SERIAL_PREFIX_MAP or the filename:
+# 'models' and 'types' list the radios the whole group applies to (default: all), and
+# 'skip_fields' maps a model or type to fields those radios do not have.
 CHECKS_TO_PERFORM = [
 
     # ----------------------------------------------------------
@@ -122,7 +155,7 @@ CHECKS_TO_PERFORM = [
     # -- Phase 2 Voice Capable --
     {
         'group_name': 'Phase 2 Voice Capable',
-        'base_xpath': f".//Recset[@Name='Trunking System']/Node[contains(translate(@ReferenceKey, '{UPPER_ABC}', '{LOWER_ABC}'), 'gwinnett')]/Section[@Name='ASTRO 25']",
+        'base_xpath': ".//Recset[@Name='Trunking System']/Node[ci:contains(@ReferenceKey, 'gwinnett')]/Section[@Name='ASTRO 25']",
         'context_node_name': 'Trunking System',
         'fields': {
             'Phase 2 Voice Capable': 'True'
@@ -499,6 +532,7 @@ CHECKS_TO_PERFORM = [
         'group_name': 'INTEROP - GW IO 1',
         'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[contains(@ReferenceKey, 'INTEROP')]//EmbeddedNode[@ReferenceKey='1-GW IO 1']",
         'context_node_name': 'Zone Channel Assignment',
+        'skip_fields': {'Mobile': ['Top Display Channel']}, # Mobile and Console radios have no top display
         'fields': {
             'Channel Type': 'Trk',
             'Personality': '027A - IO',
@@ -514,6 +548,7 @@ CHECKS_TO_PERFORM = [
         'group_name': 'INTEROP - GW IO 2',
         'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[contains(@ReferenceKey, 'INTEROP')]//EmbeddedNode[@ReferenceKey='2-GW IO 2']",
         'context_node_name': 'Zone Channel Assignment',
+        'skip_fields': {'Mobile': ['Top Display Channel']}, # Mobile and Console radios have no top display
         'fields': {
             'Channel Type': 'Trk',
             'Personality': '027A - IO',
@@ -529,6 +564,7 @@ CHECKS_TO_PERFORM = [
         'group_name': 'INTEROP - GW IO 3',
         'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[contains(@ReferenceKey, 'INTEROP')]//EmbeddedNode[@ReferenceKey='3-GW IO 3']",
         'context_node_name': 'Zone Channel Assignment',
+        'skip_fields': {'Mobile': ['Top Display Channel']}, # Mobile and Console radios have no top display
         'fields': {
             'Channel Type': 'Trk',
             'Personality': '027A - IO',
@@ -544,6 +580,7 @@ CHECKS_TO_PERFORM = [
         'group_name': 'INTEROP - GW IO 4',
         'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[contains(@ReferenceKey, 'INTEROP')]//EmbeddedNode[@ReferenceKey='4-GW IO 4']",
         'context_node_name': 'Zone Channel Assignment',
+        'skip_fields': {'Mobile': ['Top Display Channel']}, # Mobile and Console radios have no top display
         'fields': {
             'Channel Type': 'Trk',
             'Personality': '027A - IO',
@@ -559,6 +596,7 @@ CHECKS_TO_PERFORM = [
         'group_name': 'INTEROP - GW IO 5',
         'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[contains(@ReferenceKey, 'INTEROP')]//EmbeddedNode[@ReferenceKey='5-GW IO 5']",
         'context_node_name': 'Zone Channel Assignment',
+        'skip_fields': {'Mobile': ['Top Display Channel']}, # Mobile and Console radios have no top display
         'fields': {
             'Channel Type': 'Trk',
             'Personality': '027A - IO',
@@ -574,6 +612,7 @@ CHECKS_TO_PERFORM = [
         'group_name': 'INTEROP - GW IO 6',
         'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[contains(@ReferenceKey, 'INTEROP')]//EmbeddedNode[@ReferenceKey='6-GW IO 6']",
         'context_node_name': 'Zone Channel Assignment',
+        'skip_fields': {'Mobile': ['Top Display Channel']}, # Mobile and Console radios have no top display
         'fields': {
             'Channel Type': 'Trk',
             'Personality': '027A - IO',
@@ -587,8 +626,9 @@ CHECKS_TO_PERFORM = [
     # -- 8CALL90 Channel--
     {
         'group_name': 'INTEROP - 8CALL90',
-        'base_xpath': f".//Recset[@Name='Zone Channel Assignment']/Node[contains(translate(@ReferenceKey, '{UPPER_ABC}', '{LOWER_ABC}'), 'interop')]//EmbeddedNode[@ReferenceKey='7-8CALL90']",
+        'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[ci:contains(@ReferenceKey, 'interop')]//EmbeddedNode[@ReferenceKey='7-8CALL90']",
         'context_node_name': 'Zone Channel Assignment',
+        'skip_fields': {'Mobile': ['Top Display Channel']}, # Mobile and Console radios have no top display
         'fields': {
             'Channel Type': 'Cnv',
             'Personality': ['800 ANALOG','8TAC'], # acceptable list
@@ -600,17 +640,91 @@ CHECKS_TO_PERFORM = [
 
 ]
 
-def _get_unit_id_for_system(root, system_name_contains):
+# Named rule profiles. 'talkgroups' adds the talkgroup consistency check.
+CHECK_PROFILES = {
+    'Gwinnett': {'checks': CHECKS_TO_PERFORM, 'talkgroups': True},
+    # interop requirements shared with Dekalb, Fulton, Atlanta, Cobb and Hall
+    'Interop': {
+        'checks': [group for group in CHECKS_TO_PERFORM if group['group_name'].endswith('Personality') or group['group_name'].startswith('INTEROP')],
+        'talkgroups': False,
+    },
+}
+DEFAULT_PROFILE = 'Gwinnett'
+
+def _build_profile_plan(profile_names):
     """
-    Returns an integer ID for a Trunking System whose ReferenceKey contains the given name.
+    Merges the groups of several profiles so each group is evaluated once per file.
+    Returns (groups, {profile name: (indexes into groups, talkgroups)}).
     """
+    groups = []
+    group_index = {}
+    profiles = {}
+    for name in profile_names:
+        indexes = []
+        for group in CHECK_PROFILES[name]['checks']:
+            if id(group) not in group_index:
+                group_index[id(group)] = len(groups)
+                groups.append(group)
+            indexes.append(group_index[id(group)])
+        profiles[name] = (indexes, CHECK_PROFILES[name]['talkgroups'])
+    return groups, profiles
+
+# metadata key -> text the Trunking System ReferenceKey contains
+UNIT_ID_SYSTEMS = {
+    "gwinnett_id": "GWINNETT",
+    "dekalb_id": "Dekalb",
+    "hall_id": "Hall",
+    "cobb_id": "UASI",
+    "atlanta_id": "Atlanta",
+    "fulton_id": "FULTON",
+}
 
-    # Convert your search term to lowercase in Python
-    search_term_lower = system_name_contains.lower()
+RADIO_ALIAS_FIELD = 'User Information\\Radio Alias'
+
+_FOLDED_KEYS = {}
+
+def _fold_key(value):
+    """Case-folded ReferenceKey/Name. Each distinct key is folded once and reused for every file."""
+    folded = _FOLDED_KEYS.get(value)
+    if folded is None:
+        if len(_FOLDED_KEYS) >= FOLDED_KEYS_MAX:
+            _FOLDED_KEYS.clear()
+        folded = _FOLDED_KEYS[value] = value.casefold()
+    return folded
+
+def _ci_function(match):
+    """XPath extension function: true if any string in `values` matches `needle`, ignoring case."""
+    def xpath_function(context, values, needle):
+        if isinstance(values, str):
+            values = [values]
+        needle = _fold_key(needle)
+        return any(match(_fold_key(value if isinstance(value, str) else "".join(value.itertext())), needle) for value in values)
+    return xpath_function
+
+_CI_FUNCTIONS = ETREE.FunctionNamespace(CI_NAMESPACE)
+for _name, _match in CI_MATCHERS.items():
+    _CI_FUNCTIONS[_name] = _ci_function(_match)
+
+# lxml runs a compiled XPath under its own lock, so --serve threads each get their own copies
+_XPATHS = threading.local()
+
+def _compiled_xpath(expression):
+    """Compiles an XPath once per thread, with the ci: functions available."""
+    xpaths = getattr(_XPATHS, 'cache', None)
+    if xpaths is None:
+        xpaths = _XPATHS.cache = {}
+    xpath = xpaths.get(expression)
+    if xpath is None:
+        xpath = xpaths[expression] = ETREE.XPath(expression, namespaces=XPATH_NAMESPACES)
+    return xpath
+
+_UNIT_ID_XPATH = ".//Recset[@Name='Trunking System']/Node[ci:contains(@ReferenceKey, $system)]/Section[@Name='General']/Field[@Name='Unit ID']"
 
-    xpath = f".//Recset[@Name='Trunking System']/Node[contains(translate(@ReferenceKey, '{UPPER_ABC}', '{LOWER_ABC}'), '{search_term_lower}')]/Section[@Name='General']/Field[@Name='Unit ID']"
-    
-    elements = root.xpath(xpath)
+def _get_unit_id_for_system(root, system_name_contains):
+    """
+    Returns an integer ID for a Trunking System whose ReferenceKey contains the given name.
+    """
+    elements = _compiled_xpath(_UNIT_ID_XPATH)(root, system=system_name_contains)
     if elements and elements[0].text:
         try:
             return int(elements[0].text.strip())
@@ -630,64 +744,65 @@ def _extract_metadata(root):
     }
 
     # Extract Alias
-    alias_elements = root.xpath(".//Recset[@Name='Radio Wide']//Field[@Name='User Information\\Radio Alias']")
+    alias_elements = root.xpath(f".//Recset[@Name='Radio Wide']//Field[@Name='{RADIO_ALIAS_FIELD}']")
     if alias_elements and alias_elements[0].text:
         metadata["alias"] = alias_elements[0].text.strip()
     
     # Extract Unit IDs for each system
-    metadata["gwinnett_id"] = _get_unit_id_for_system(root, "GWINNETT")
-    metadata["dekalb_id"] = _get_unit_id_for_system(root, "Dekalb")
-    metadata["hall_id"] = _get_unit_id_for_system(root, "Hall")
-    metadata["cobb_id"] = _get_unit_id_for_system(root, "UASI")
-    metadata["atlanta_id"] = _get_unit_id_for_system(root, "Atlanta")
-    metadata["fulton_id"] = _get_unit_id_for_system(root, "FULTON")
+    for key, system_name in UNIT_ID_SYSTEMS.items():
+        metadata[key] = _get_unit_id_for_system(root, system_name)
 
     return metadata
 
+XML_HEADER = ['Serial', 'XML-Alias', 'XML-Gw', 'Setting','Reference', 'Group','Problem', 'Expected', 'Actual', 'Model', 'Type', 'Dekalb', 'TD-Dekalb', 'Fulton', 'TD-Fulton', 'Atlanta', 'TD-Atl', 'Cobb', 'TD-Cobb', 'Hall', 'TD-Hall', 'TD-Gw', 'TD-Alias']
+
+def _finding_row(serial, metadata, system_context, group_name, setting, problem, expected, actual, model, mobile_hh):
+    """Builds one report row in the column order of the report header."""
+    return [serial, metadata['alias'], metadata['gwinnett_id'], system_context, group_name, setting, problem, expected, actual, model, mobile_hh, metadata['dekalb_id'], "", metadata['fulton_id'], "", metadata['atlanta_id'], "", metadata['cobb_id'], "", metadata['hall_id'], "", "TD-Gw", "TD-Alias"]
+
+def _success_row(serial, metadata, model, mobile_hh):
+    return [serial, metadata['alias'], metadata['gwinnett_id'], "OK", "OK", "OK", "OK", "OK", "OK", model, mobile_hh, metadata['dekalb_id'], "", metadata['fulton_id'], "", metadata['atlanta_id'], "", metadata['cobb_id'], "", metadata['hall_id'], "" , "TD-Gw-ID", "TD-Alias"]
+
+def _expected_text(expected_value):
+    return " or ".join(expected_value) if isinstance(expected_value, list) else str(expected_value)
+
+def _check_field_value(expected_value, actual_value):
+    """Returns (is_valid, expected value as report text)."""
+    # if the expected value is a list, check if actual value is in the list
+    if isinstance(expected_value, list):
+        return actual_value in expected_value, _expected_text(expected_value)
+    return actual_value == expected_value, _expected_text(expected_value)
+
 # display problems
 def _process_check_group(root, group, metadata, serial, model, mobile_hh):
     error_rows = []
     group_name = group['group_name']
-    parents = root.xpath(group['base_xpath'])
+    parents = _compiled_xpath(group['base_xpath'])(root)
 
     if not parents:
-        error_rows.append([serial, metadata['alias'], metadata['gwinnett_id'], "N/A", group_name, "N/A", "Section Missing", "N/A", "N/A", model, mobile_hh, metadata['dekalb_id'], "", metadata['fulton_id'], "", metadata['atlanta_id'], "", metadata['cobb_id'], "", metadata['hall_id'], "", "TD-Gw", "TD-Alias"])
+        error_rows.append(_finding_row(serial, metadata, "N/A", group_name, "N/A", "Section Missing", "N/A", "N/A", model, mobile_hh))
         return error_rows
 
     for parent in parents:
         system_context = "N/A"
         context_name = group.get('context_node_name') # Get the context to search for
         if context_name:
-            context_xpath = f"ancestor::Node[@Name='{context_name}'][1]/@ReferenceKey"
-            context_keys = parent.xpath(context_xpath)
+            context_keys = _compiled_xpath(f"ancestor::Node[@Name='{context_name}'][1]/@ReferenceKey")(parent)
             if context_keys:
                 system_context = context_keys[0]
 
         for field_name, expected_value in group['fields'].items():
-            if mobile_hh == 'Mobile' and field_name == 'Top Display Channel':
-                continue # Skip 'Top Display Channel' for Mobile or Console radios
-            field_elements = parent.xpath(f".//Field[@Name='{field_name}']")
+            field_elements = _compiled_xpath(f".//Field[@Name='{field_name}']")(parent)
 
             if not field_elements:
-                error_rows.append([serial, metadata['alias'], metadata['gwinnett_id'], system_context, group_name, field_name, "Setting Missing", expected_value, "N/A", model, mobile_hh, metadata['dekalb_id'], "", metadata['fulton_id'], "", metadata['atlanta_id'], "", metadata['cobb_id'], "", metadata['hall_id'], "", "TD-Gw", "TD-Alias"])
+                error_rows.append(_finding_row(serial, metadata, system_context, group_name, field_name, "Setting Missing", _expected_text(expected_value), "N/A", model, mobile_hh))
                 continue
 
             actual_value = field_elements[0].text or ""
-            is_valid = False
-            expected_value_joined = ""
-
-            # if the expected value is a list, check if actual value is in the list
-            if isinstance(expected_value, list):
-                if actual_value in expected_value:
-                    is_valid = True
-                expected_value_joined = " or ".join(expected_value)
-            else:
-                expected_value_joined = str(expected_value)
-                if actual_value == expected_value:
-                    is_valid = True
+            is_valid, expected_value_joined = _check_field_value(expected_value, actual_value)
 
             if not is_valid:
-                error_rows.append([serial, metadata['alias'], metadata['gwinnett_id'], system_context, group_name, field_name, "Incorrect Value", expected_value_joined, actual_value, model, mobile_hh, metadata['dekalb_id'], "", metadata['fulton_id'], "", metadata['atlanta_id'], "", metadata['cobb_id'], "", metadata['hall_id'], "", "TD-Gw", "TD-Alias"])
+                error_rows.append(_finding_row(serial, metadata, system_context, group_name, field_name, "Incorrect Value", expected_value_joined, actual_value, model, mobile_hh))
                 
     return error_rows
 
@@ -710,6 +825,12 @@ def _get_model_and_mobile_from_serial(serial):
     prefix = serial[:3]
     return SERIAL_PREFIX_MAP.get(prefix, default)
 
+def _get_model_and_type(serial):
+    """Model and type (Portable/Mobile) from a 10-digit serial or a descriptive filename."""
+    if len(serial)==10:
+        return _get_model_and_mobile_from_serial(serial)
+    return _get_model_from_filename(serial), _get_mobile_from_filename(serial)
+
 def _get_model_from_filename(serial):
     if '4000' in serial:
         return 4000
@@ -746,14 +867,58 @@ def _get_mobile_from_model(serial):
     else:
         return 'Is Type in Filename?'
 
-def _validate_talkgroup_match(root, metadata, filename):
+def _group_for_radio(group, model, mobile_hh):
+    """The group with the fields that radio does not have removed, or None if the group does not apply to it."""
+    if 'models' in group and model not in group['models']:
+        return None
+    if 'types' in group and mobile_hh not in group['types']:
+        return None
+    skip_fields = group.get('skip_fields', {})
+    skipped = set(skip_fields.get(model, ())) | set(skip_fields.get(mobile_hh, ()))
+    if skipped:
+        group = {**group, 'fields': {name: value for name, value in group['fields'].items() if name not in skipped}}
+    return group
+
+_CHECKS_KEY = [(None, None)] # [(last checks list seen, its key)], swapped whole so threads never see half of it
+
+def _checks_key(checks):
+    """
+    A key for the content of a checks list. Worker tasks each unpickle their own copy of the
+    same rules, so the list's id() would never repeat; its repr is only taken when the list changes.
+    """
+    last = _CHECKS_KEY[0]
+    if last[0] is not checks:
+        last = _CHECKS_KEY[0] = (checks, repr(checks))
+    return last[1]
+
+_MODEL_PLANS = {} # (checks key, model, type) -> plan
+
+def _get_model_plan(checks, model, mobile_hh):
+    """
+    The groups of `checks` that apply to one model and type, pruned to the fields it has:
+    [(index into checks, group)]. Compiled once per combination.
+    """
+    key = (_checks_key(checks), model, mobile_hh)
+    plan = _MODEL_PLANS.get(key)
+    if plan is None:
+        plan = [(group_order, _group_for_radio(group, model, mobile_hh)) for group_order, group in enumerate(checks)]
+        plan = _MODEL_PLANS[key] = [(group_order, group) for group_order, group in plan if group is not None]
+    return plan
+
+def _validate_talkgroup_match(root, metadata, filename, model, mobile_hh):
     """
     Any 'ASTRO Talkgroup ID' matches its corresponding 
     'Talkgroup Alias Text' and 'ReferenceKey'
     Returns a list of error rows if any mismatches are found.
     """
-    error_rows = []
+    talkgroup_definitions, usages = _collect_talkgroups(root)
+    return _talkgroup_error_rows(usages, talkgroup_definitions, metadata, filename, model, mobile_hh)
 
+def _collect_talkgroups(root):
+    """
+    Returns ({ReferenceKey: Talkgroup Alias Text} for every defined talkgroup,
+    [(used ID, context key)] for every 'ASTRO Talkgroup ID' field).
+    """
     # 1. Build a map of all defined Talkgroup Aliases.
     talkgroup_definitions = {}
     definition_nodes = root.xpath(".//Recset[@Name='ASTRO Talkgroup List']//EmbeddedNode[@Name='Talkgroup Table']")
@@ -762,22 +927,24 @@ def _validate_talkgroup_match(root, metadata, filename):
         alias_text_elements = node.xpath(".//Field[@Name='Talkgroup Alias Text']")
         if ref_key and alias_text_elements and alias_text_elements[0].text is not None:
             talkgroup_definitions[ref_key] = alias_text_elements[0].text.strip()
-    
-    # 2. Check every 'ASTRO Talkgroup ID' field in the file.
-    id_usage_fields = root.xpath(".//Field[@Name='ASTRO Talkgroup ID']")
-    for field in id_usage_fields:
-        used_id = field.text.strip() if field.text else ""
-        
-        if used_id in ["TG 1", ""]: # Ignore the default "TG 1" case
-            continue
 
-        # Does the used ID exist as a key, and does its value also match?
-        if talkgroup_definitions.get(used_id) == used_id:
-            continue  # success case: all three strings match.
+    # 2. Every 'ASTRO Talkgroup ID' field and the nearest ancestor with a ReferenceKey.
+    usages = []
+    for field in root.xpath(".//Field[@Name='ASTRO Talkgroup ID']"):
+        used_id = field.text.strip() if field.text else ""
+        context_key = next((key for key in (a.get('ReferenceKey') for a in field.iterancestors()) if key is not None), "Unknown Context")
+        usages.append((used_id, context_key))
+    return talkgroup_definitions, usages
 
-        # Something is wrong if we reach here
-        context_node = field.xpath("ancestor::*[@ReferenceKey][1]")
-        context_key = context_node[0].get('ReferenceKey') if context_node else "Unknown Context"
+def _talkgroup_error_rows(usages, talkgroup_definitions, metadata, filename, model, mobile_hh):
+    """
+    Report rows for (used ID, context key) usages whose Talkgroup Alias
+    is undeclared or does not match its ReferenceKey.
+    """
+    error_rows = []
+    for used_id, context_key in usages:
+        if used_id in ["TG 1", ""] or talkgroup_definitions.get(used_id) == used_id:
+            continue
 
         if used_id not in talkgroup_definitions:
             issue = "Undeclared Talkgroup ID"
@@ -788,70 +955,2164 @@ def _validate_talkgroup_match(root, metadata, filename):
             expected = f"Alias Text to match ReferenceKey ('{used_id}')"
             actual = talkgroup_definitions.get(used_id, "Not Found")
         
-        error_rows.append([
-            filename,
-            metadata['alias'],
-            metadata['gwinnett_id'],
-            metadata['model'],
-            metadata['type'],
-            metadata['dekalb_id'],
-            metadata['fulton_id'],
-            metadata['atlanta_id'],
-            metadata['cobb_id'],
-            metadata['hall_id'],
-            context_key,                        #System Context
-            "Talkgroup Consistency",            #Group Name
-            f"ASTRO Talkgroup ID: {used_id}",   #Setting Name
-            issue,
-            expected,
-            actual
-        ])
+        error_rows.append(_finding_row(filename, metadata, context_key, "Talkgroup Consistency", f"ASTRO Talkgroup ID: {used_id}", issue, expected, actual, model, mobile_hh))
     
     return error_rows
 
+def _evaluate_file_tree(filepath, checks, talkgroups=True):
+    """
+    Parses one codeplug and runs every group in `checks` on it.
+    Returns (serial, metadata, model, type, error rows per group, talkgroup error rows,
+    (talkgroup definitions, talkgroup usages) or None when talkgroups are not checked).
+    Raises ETREE.XMLSyntaxError for files that cannot be parsed.
+    """
+    with METRICS.timed('parse'):
+        parser = ETREE.XMLParser(remove_blank_text=True, resolve_entities=False)
+        tree = ETREE.parse(filepath, parser)
+    root = tree.getroot()
+    filename = os.path.basename(filepath)
+    serial = filename.removesuffix('.xml')
+    model, mobile = _get_model_and_type(serial)
+
+    metadata = _extract_metadata(root)
+
+    with METRICS.timed('checks'):
+        group_rows = [[] for _ in checks] # groups that do not apply to this model/type have no findings
+        for group_order, group in _get_model_plan(checks, model, mobile):
+            group_rows[group_order] = _process_check_group(root, group, metadata, serial, model, mobile)
+    talkgroup_facts = None
+    talkgroup_rows = []
+    if talkgroups:
+        with METRICS.timed('talkgroups'):
+            talkgroup_facts = _collect_talkgroups(root)
+            talkgroup_rows = _talkgroup_error_rows(talkgroup_facts[1], talkgroup_facts[0], metadata, serial, model, mobile)
+    return serial, metadata, model, mobile, group_rows, talkgroup_rows, talkgroup_facts
+
+def _record_file_result(result, report_rows, group_indexes=None, talkgroups=True):
+    """Appends a file's error rows, or its success row, to report_rows. Returns True if it has errors."""
+    serial, metadata, model, mobile, group_rows, talkgroup_rows = result[:6]
+    if group_indexes is None:
+        group_indexes = range(len(group_rows))
+
+    discrepancies_in_file = []
+    for i in group_indexes:
+        discrepancies_in_file.extend(group_rows[i])
+    if talkgroups:
+        discrepancies_in_file.extend(talkgroup_rows)
+
+    if not discrepancies_in_file:
+        report_rows.append(_success_row(serial, metadata, model, mobile))
+        return False
+    else:
+        report_rows.extend(discrepancies_in_file)
+        return True
+
 # Check XML file
 def check_xml_file(filepath, report_rows):
     try:
-        parser = ETREE.XMLParser(remove_blank_text=True, resolve_entities=False)
-        tree = ETREE.parse(filepath, parser)
-        root = tree.getroot()
-        filename = os.path.basename(filepath)
-        serial = filename.removesuffix('.xml')
+        result = _evaluate_file_tree(filepath, CHECKS_TO_PERFORM)
+    except ETREE.XMLSyntaxError:
+        # this should not happen due to prior validation
+        print(f"Error: Could not parse XML file '{filepath}'.")
+        report_rows.append(_parse_error_row(filepath))
+        return True
+    return _record_file_result(result, report_rows)
 
-        if len(serial)==10:
-            model, mobile = _get_model_and_mobile_from_serial(serial)
+def check_xml_file_profiles(filepath, profile_rows, plan, engine='tree', talkgroup_facts=None):
+    """
+    Checks one file against several profiles with a single parse, appending
+    each profile's rows to profile_rows[profile name].
+    With a talkgroup_facts dict, also stores the file's talkgroup definitions and usages
+    there for the talkgroup index (None if the file could not be checked).
+    Returns the names of the profiles the file fails.
+    """
+    groups, profiles = plan
+    if talkgroup_facts is not None:
+        talkgroup_facts[filepath] = None
+    try:
+        if engine == 'stream':
+            result = _evaluate_file_streaming(filepath, groups)
         else:
-            model = _get_model_from_filename(serial)
-            mobile = _get_mobile_from_filename(serial)
+            result = _evaluate_file_tree(filepath, groups, talkgroups=any(talkgroups for _, talkgroups in profiles.values()))
+    except ETREE.XMLSyntaxError:
+        print(f"Error: Could not parse XML file '{filepath}'.")
+        for name in profiles:
+            profile_rows[name].append(_parse_error_row(filepath))
+        return set(profiles)
+    except Exception as e: # one bad file must not end the run
+        reason = "out of memory" if isinstance(e, MemoryError) else f"{type(e).__name__}: {e}"
+        print(f"Error: Could not check '{filepath}': {reason}")
+        for name in profiles:
+            profile_rows[name].append(_could_not_check_row(filepath, reason))
+        return set(profiles)
+
+    if talkgroup_facts is not None:
+        talkgroup_facts[filepath] = result[6]
+    failed = set()
+    for name, (group_indexes, talkgroups) in profiles.items():
+        if _record_file_result(result, profile_rows[name], group_indexes, talkgroups):
+            failed.add(name)
+    return failed
+
+# Problem values of rows that stand for a whole file rather than a finding
+FILE_ERROR_PROBLEMS = ("Could not parse XML", "Could not check", "Quarantined")
+
+def _file_error_row(filepath, problem, actual=""):
+    """
+    Row for a file that produced no findings because it could not be checked. Only the Serial,
+    Problem, Actual, Model and Type are filled in; the setting and group cells are left empty.
+    """
+    serial = os.path.basename(filepath)
+    model, mobile_hh = _get_model_and_type(serial.removesuffix('.xml'))
+    return [serial, "", "", "", "", "", problem, "", actual, model, mobile_hh] + [""] * (len(XML_HEADER) - 11)
 
-        metadata = _extract_metadata(root)
+def _parse_error_row(filepath):
+    return _file_error_row(filepath, "Could not parse XML")
 
-        discrepancies_in_file = []
-        
-        for group in CHECKS_TO_PERFORM:
-            errors = _process_check_group(root, group, metadata, serial, model, mobile)
-            if errors:
-                discrepancies_in_file.extend(errors)
-        
-        talkgroup_errors = _validate_talkgroup_match(root, metadata, serial)
-        if talkgroup_errors:
-            discrepancies_in_file.extend(talkgroup_errors)
+def _could_not_check_row(filepath, reason):
+    return _file_error_row(filepath, "Could not check", reason)
 
-        if not discrepancies_in_file:
-            success_row = [serial, metadata['alias'], metadata['gwinnett_id'], "OK", "OK", "OK", "OK", "OK", "OK", model, mobile, metadata['dekalb_id'], "", metadata['fulton_id'], "", metadata['atlanta_id'], "", metadata['cobb_id'], "", metadata['hall_id'], "" , "TD-Gw-ID", "TD-Alias"]
-            report_rows.append(success_row)
-            return False
+####
+# Progress and run metrics
+####
+
+PROGRESS_INTERVAL = 2.0 # seconds between progress lines
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # seconds
+
+METRIC_COUNTERS = {
+    'files_checked': "Codeplug files checked.",
+    'files_with_errors': "Codeplug files with at least one finding or error.",
+    'bytes_checked': "Bytes of codeplug XML checked.",
+    'files_resumed': "Codeplug files skipped because the run journal already had their results.",
+}
+
+def _peak_memory_bytes():
+    """Peak resident memory of this process (and its finished child processes), or None if unknown."""
+    try:
+        import resource
+    except ImportError: # Windows
+        counters = _process_memory_windows()
+        return counters.PeakWorkingSetSize if counters else None
+    scale = 1 if sys.platform == 'darwin' else 1024 # ru_maxrss is bytes on macOS, KiB elsewhere
+    return scale * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+def _current_rss():
+    """Current resident memory of this process, or None if unknown."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        counters = _process_memory_windows()
+        return counters.WorkingSetSize if counters else None
+
+def _process_memory_windows():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                                                     'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters
+    except (AttributeError, OSError):
+        pass
+    return None
+
+class RunMetrics:
+    """
+    Counters, cache hit/miss counts and per-phase latency histograms for one run.
+    Worker processes keep their own and send drain() back to be merged into the parent's.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lock = threading.Lock() # the query service records from several threads
+        self.track_rss = False # sample resident memory at the end of every phase (adaptive workers)
+        self.rss_high = 0
+        self._reset()
+
+    def _reset(self):
+        self.counters = collections.Counter()
+        self.caches = collections.defaultdict(lambda: [0, 0]) # name -> [hits, misses]
+        self.phases = {} # phase -> [count per bucket (last is +Inf), total seconds]
+        self.worker_peak_memory = 0
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def cache_lookup(self, cache, hit):
+        with self.lock:
+            self.caches[cache][0 if hit else 1] += 1
+
+    def observe(self, phase, seconds):
+        with self.lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+            histogram[0][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+
+    @contextlib.contextmanager
+    def timed(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - started)
+            if self.track_rss: # a parsed tree is still alive at the end of its phase
+                self.rss_high = max(self.rss_high, _current_rss() or 0)
+
+    def drain(self):
+        """Returns everything recorded so far as plain data and starts over."""
+        with self.lock:
+            snapshot = {
+                'counters': dict(self.counters),
+                'caches': {name: list(counts) for name, counts in self.caches.items()},
+                'phases': {phase: [list(buckets), seconds] for phase, (buckets, seconds) in self.phases.items()},
+                'peak_memory': max(_peak_memory_bytes() or 0, self.worker_peak_memory),
+            }
+            self._reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        with self.lock:
+            self.counters.update(snapshot['counters'])
+            for name, (hits, misses) in snapshot['caches'].items():
+                self.caches[name][0] += hits
+                self.caches[name][1] += misses
+            for phase, (buckets, seconds) in snapshot['phases'].items():
+                histogram = self.phases.setdefault(phase, [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += seconds
+            self.worker_peak_memory = max(self.worker_peak_memory, snapshot['peak_memory'])
+
+    def to_dict(self):
+        with self.lock:
+            phases = {}
+            for phase, (buckets, seconds) in sorted(self.phases.items()):
+                count = sum(buckets)
+                cumulative = list(itertools.accumulate(buckets))
+                phases[phase] = {
+                    'count': count,
+                    'seconds': round(seconds, 6),
+                    'mean_seconds': round(seconds / count, 6) if count else None,
+                    'buckets': dict(zip([str(le) for le in LATENCY_BUCKETS] + ['+Inf'], cumulative)),
+                }
+            caches = {name: {'hits': hits, 'misses': misses, 'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None}
+                      for name, (hits, misses) in sorted(self.caches.items())}
+            return {
+                'elapsed_seconds': round(time.monotonic() - self.started, 3),
+                'peak_memory_bytes': max(_peak_memory_bytes() or 0, self.worker_peak_memory) or None,
+                'counters': {name: self.counters.get(name, 0) for name in METRIC_COUNTERS},
+                'phases': phases,
+                'caches': caches,
+            }
+
+    def prometheus_text(self):
+        """The metrics in the Prometheus text exposition format."""
+        metrics = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        for name, help_text in METRIC_COUNTERS.items():
+            metric(f"codeplug_{name}_total", 'counter', help_text, [('', metrics['counters'][name])])
+        metric('codeplug_run_seconds', 'gauge', "Seconds since the run started.", [('', metrics['elapsed_seconds'])])
+        if metrics['peak_memory_bytes'] is not None:
+            metric('codeplug_peak_memory_bytes', 'gauge', "Peak resident memory of the run.", [('', metrics['peak_memory_bytes'])])
+
+        samples = []
+        for phase, histogram in metrics['phases'].items():
+            samples.extend((f'_bucket{{phase="{phase}",le="{le}"}}', count) for le, count in histogram['buckets'].items())
+            samples.append((f'_sum{{phase="{phase}"}}', histogram['seconds']))
+            samples.append((f'_count{{phase="{phase}"}}', histogram['count']))
+        lines.append("# HELP codeplug_phase_seconds Time spent in each phase, per file for checking phases.")
+        lines.append("# TYPE codeplug_phase_seconds histogram")
+        lines.extend(f"codeplug_phase_seconds{labels} {value}" for labels, value in samples)
+
+        metric('codeplug_cache_requests_total', 'counter', "Cache lookups by result.",
+               [(f'{{cache="{name}",result="{result}"}}', cache[key]) for name, cache in metrics['caches'].items() for result, key in (('hit', 'hits'), ('miss', 'misses'))])
+        metric('codeplug_cache_hit_ratio', 'gauge', "Share of cache lookups that were hits.",
+               [(f'{{cache="{name}"}}', cache['hit_rate']) for name, cache in metrics['caches'].items() if cache['hit_rate'] is not None])
+        return "\n".join(lines) + "\n"
+
+METRICS = RunMetrics()
+
+def write_metrics(prometheus_path=None, json_path=None):
+    if prometheus_path:
+        with open(prometheus_path, 'w', encoding='utf-8') as f:
+            f.write(METRICS.prometheus_text())
+        print(f"Metrics saved: {prometheus_path}")
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(METRICS.to_dict(), f, indent=2)
+        print(f"Metrics saved: {json_path}")
+
+class ProgressReporter:
+    """
+    Prints at most one progress line every `interval` seconds (files/s, MB/s, errors so far, ETA)
+    instead of a line per file, and counts the checked files in METRICS.
+    """
+
+    def __init__(self, xml_files, label="Checked", interval=PROGRESS_INTERVAL, show_errors=True):
+        self.sizes = {filepath: os.path.getsize(filepath) for filepath in xml_files}
+        self.total_files = len(xml_files)
+        self.total_bytes = sum(self.sizes.values())
+        self.label = label
+        self.interval = interval
+        self.show_errors = show_errors
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.next_report = self.started + interval
+        self.reported_files = 0
+
+    def update(self, filepaths, errors=0):
+        nbytes = sum(self.sizes.get(filepath, 0) for filepath in filepaths)
+        self.files += len(filepaths)
+        self.bytes += nbytes
+        self.errors += errors
+        METRICS.count('files_checked', len(filepaths))
+        METRICS.count('bytes_checked', nbytes)
+        METRICS.count('files_with_errors', errors)
+        now = time.monotonic()
+        if now >= self.next_report:
+            self._report(now)
+            self.next_report = now + self.interval
+
+    def finish(self):
+        if self.files != self.reported_files:
+            self._report(time.monotonic())
+
+    def _report(self, now):
+        elapsed = max(now - self.started, 1e-9)
+        files_per_second = self.files / elapsed
+        remaining = self.total_files - self.files
+        eta = timedelta(seconds=round(remaining / files_per_second)) if files_per_second else "unknown"
+        errors = f" | {self.errors} with errors" if self.show_errors else ""
+        print(f"{self.label} {self.files} of {self.total_files} files | {files_per_second:.1f} files/s | "
+              f"{self.bytes / elapsed / 1e6:.1f} MB/s{errors} | ETA {eta}")
+        self.reported_files = self.files
+
+####
+# Pre-validation and quarantine
+####
+
+CODEPLUG_ROOT_TAG = 'Codeplug'
+REQUIRED_RECSETS = ('Radio Wide',) # the alias and Unit IDs in every report row come from here
+PREVALIDATE_PARALLEL_FILES = 200 # below this, starting worker processes costs more than it saves
+
+class _StructureTarget:
+    """Parser target that keeps only what pre-validation needs: the root tag, the open elements and the Recset names."""
+
+    def __init__(self):
+        self.elements = 0
+        self.root_tag = None
+        self.open_tags = []
+        self.recsets = set()
+
+    def start(self, tag, attrib):
+        if not self.elements:
+            self.root_tag = tag
+        self.elements += 1
+        self.open_tags.append(tag)
+        if tag == 'Recset':
+            self.recsets.add(attrib.get('Name'))
+
+    def end(self, tag):
+        self.open_tags.pop()
+
+    def close(self):
+        return self
+
+def _file_end_position(filepath):
+    """(line, column) just past the last byte of a file, as the XML parser counts them."""
+    lines, last_line_length = 1, 0
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            newlines = chunk.count(b'\n')
+            if newlines:
+                lines += newlines
+                last_line_length = len(chunk) - chunk.rfind(b'\n') - 1
+            else:
+                last_line_length += len(chunk)
+    return lines, last_line_length
+
+def _prevalidate_file(filepath):
+    """
+    Cheap streaming check that a file is a complete, well-formed codeplug export, without building a tree.
+    Returns None for a good file, otherwise the reason to quarantine it.
+    """
+    if os.path.getsize(filepath) == 0:
+        return "Empty file"
+    target = _StructureTarget()
+    parser = ETREE.XMLParser(target=target, resolve_entities=False)
+    try:
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+                parser.feed(chunk)
+        parser.close()
+    except ETREE.XMLSyntaxError as e:
+        if not target.elements:
+            return "Empty export (no XML elements)"
+        if target.open_tags and tuple(e.position) >= _file_end_position(filepath):
+            return f"Truncated export (ends inside <{target.open_tags[-1]}>)"
+        return f"Malformed XML: {e.msg}"
+
+    if target.root_tag != CODEPLUG_ROOT_TAG:
+        return f"Not a codeplug export (root element <{target.root_tag}>)"
+    if not target.recsets:
+        return "Not a codeplug export (no Recset elements)"
+    missing = [name for name in REQUIRED_RECSETS if name not in target.recsets]
+    if missing:
+        return f"Missing Recset '{missing[0]}'"
+    return None
+
+def prevalidate_files(xml_files, workers=1):
+    """
+    Splits xml_files into (clean files, {quarantined file: reason}),
+    in worker processes when there are enough files to be worth it.
+    """
+    with METRICS.timed('prevalidate'):
+        if workers > 1 and len(xml_files) >= PREVALIDATE_PARALLEL_FILES:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                reasons = list(pool.map(_prevalidate_file, xml_files, chunksize=64))
         else:
-            report_rows.extend(discrepancies_in_file)
-            return True
+            reasons = [_prevalidate_file(filepath) for filepath in xml_files]
+    clean = [filepath for filepath, reason in zip(xml_files, reasons) if reason is None]
+    quarantine = {filepath: reason for filepath, reason in zip(xml_files, reasons) if reason is not None}
+    return clean, quarantine
+
+def _quarantine_row(filepath, reason):
+    return _file_error_row(filepath, "Quarantined", reason)
+
+####
+# Vectorized fleet-wide validation
+####
+
+FLAT_COLUMNS = ['serial', 'recset', 'node_key', 'embedded_key', 'section', 'field', 'value']
+
+_RECSET_PATTERN = re.compile(r"^\.//Recset\[@Name='([^']*)'\]")
+_NODE_PATTERN = re.compile(r"^/Node\[(ci:)?(equals|contains|starts-with)\(@ReferenceKey, '([^']*)'\)\]")
+_EMBEDDED_PATTERN = re.compile(r"^//EmbeddedNode\[@ReferenceKey='([^']*)'\]$")
+_SECTION_PATTERN = re.compile(r"^/Section\[@Name='([^']*)'\]$")
+
+def _flatten_element(element, recset, node_key, embedded_keys, section, rows, top=False, fields=None):
+    """
+    Appends a row for every Field below element, like .//Field: one with no embedded key (for rules on
+    the Node or on a Section directly under it), and one for each EmbeddedNode the Field is inside.
+    `section` is the Section directly under the top Node, so nested Sections don't hide their Fields.
+    With a set of `fields`, other Fields are left out.
+    """
+    for child in element:
+        tag = child.tag
+        if tag == 'Field':
+            name = child.get('Name')
+            if fields is not None and name not in fields:
+                continue
+            name = sys.intern(name)
+            value = child.text or ""
+            rows.append((recset, node_key, None, section, name, value))
+            for embedded_key in embedded_keys:
+                rows.append((recset, node_key, embedded_key, section, name, value))
+        elif tag == 'Section' and top:
+            name = sys.intern(child.get('Name'))
+            rows.append((recset, node_key, None, name, None, None)) # marks the section as present
+            _flatten_element(child, recset, node_key, embedded_keys, name, rows, fields=fields)
+        elif tag == 'EmbeddedNode':
+            embedded_key = child.get('ReferenceKey')
+            rows.append((recset, node_key, embedded_key, section, None, None)) # marks the embedded node as present
+            _flatten_element(child, recset, node_key, embedded_keys + (embedded_key,), section, rows, fields=fields)
+        elif isinstance(tag, str):
+            _flatten_element(child, recset, node_key, embedded_keys, section, rows, fields=fields)
+
+def _flatten_codeplug(root, recsets=None, fields=None):
+    """
+    Flattens a codeplug into (recset, node key, embedded key, section, field, value) rows,
+    returned as one list per column. With sets of `recsets` and `fields`, only those are kept.
+    """
+    rows = []
+    for recset in root.iter('Recset'):
+        recset_name = recset.get('Name')
+        if recsets is not None and recset_name not in recsets:
+            continue
+        recset_name = sys.intern(recset_name)
+        for node in recset.iterchildren('Node'):
+            _flatten_element(node, recset_name, node.get('ReferenceKey'), (), None, rows, top=True, fields=fields)
+    columns = list(zip(*rows)) or [()] * len(FLAT_COLUMNS[1:])
+    return {name: list(values) for name, values in zip(FLAT_COLUMNS[1:], columns)}
+
+def _prune_flat_columns(columns, recsets, fields):
+    """Flattened columns reduced to the rows _flatten_codeplug(root, recsets, fields) would have given."""
+    keep = [i for i, (recset, field) in enumerate(zip(columns['recset'], columns['field']))
+            if recset in recsets and (field is None or field in fields)]
+    return {name: [values[i] for i in keep] for name, values in columns.items()}
+
+####
+# Codeplug snapshots
+####
+
+SNAPSHOT_VERSION = 3 # bump when the flattened column layout changes
+
+def _file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _load_snapshot(snapshot_path):
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e: # a corrupt file can make unpickling fail in almost any way; it is only a cache
+        print(f"Warning: Ignoring unreadable snapshot '{snapshot_path}' ({type(e).__name__}).")
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+def _save_snapshot(snapshot_path, snapshot):
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, snapshot_path) # never leave a half-written snapshot behind
+
+def _read_codeplug_table(filepath, snapshot_dir=None, recsets=None, fields=None):
+    """
+    Returns (metadata, flattened columns, talkgroup facts) for a codeplug, with the columns
+    reduced to `recsets` and `fields` if given.
+    With a snapshot_dir, the whole table is cached under the file's content hash,
+    so unchanged files are never parsed twice, even after the rules change.
+    Raises ETREE.XMLSyntaxError if the file has to be parsed and is broken.
+    """
+    snapshot_path = None
+    snapshot = None
+    if snapshot_dir:
+        snapshot_path = os.path.join(snapshot_dir, f"{_file_hash(filepath)}.pkl")
+        with METRICS.timed('snapshot_load'):
+            snapshot = _load_snapshot(snapshot_path)
+        METRICS.cache_lookup('snapshot', snapshot is not None)
+
+    if snapshot is None:
+        with METRICS.timed('parse'):
+            parser = ETREE.XMLParser(remove_blank_text=True, resolve_entities=False)
+            root = ETREE.parse(filepath, parser).getroot()
+        with METRICS.timed('flatten'):
+            snapshot = {'version': SNAPSHOT_VERSION, 'metadata': _extract_metadata(root), 'talkgroups': _collect_talkgroups(root)}
+            if snapshot_path:
+                snapshot['columns'] = _flatten_codeplug(root)
+            else:
+                return snapshot['metadata'], _flatten_codeplug(root, recsets, fields), snapshot['talkgroups']
+        os.makedirs(snapshot_dir, exist_ok=True)
+        _save_snapshot(snapshot_path, snapshot)
+
+    columns = snapshot['columns']
+    if recsets is not None:
+        columns = _prune_flat_columns(columns, recsets, fields)
+    return snapshot['metadata'], columns, snapshot['talkgroups']
+
+def _compile_selector(group):
+    """
+    Turns a group's base_xpath into column filters for the flattened table.
+    Raises ValueError for XPaths that cannot be expressed that way.
+    """
+    xpath = group['base_xpath']
+    selector = {'recset': None, 'node_match': None, 'embedded_key': None, 'section': None}
+
+    match = _RECSET_PATTERN.match(xpath)
+    if not match:
+        raise ValueError(f"Rule '{group['group_name']}' has no Recset to flatten: {xpath}")
+    selector['recset'] = match.group(1)
+    rest = xpath[match.end():]
+
+    match = _NODE_PATTERN.match(rest)
+    if match and (match.group(1) or match.group(2) != 'equals'): # plain equals() is not XPath
+        ci = bool(match.group(1))
+        # (operation, needle, case-insensitive)
+        selector['node_match'] = (match.group(2), _fold_key(match.group(3)) if ci else match.group(3), ci)
+        rest = rest[match.end():]
+
+    embedded = _EMBEDDED_PATTERN.match(rest)
+    section = _SECTION_PATTERN.match(rest)
+    if embedded:
+        selector['embedded_key'] = embedded.group(1)
+    elif section and selector['node_match'] is not None:
+        selector['section'] = section.group(1)
+    elif rest or selector['node_match'] is None: # a whole Recset has no single parent row
+        raise ValueError(f"Rule '{group['group_name']}' cannot be expressed as an expectation: {xpath}")
+    return selector
+
+def _build_expectations(checks):
+    """
+    Expresses CHECKS_TO_PERFORM as tables:
+    one row per expected field, and one row per accepted value.
+    """
+    expected_rows = []
+    accepted_rows = []
+    for group in checks:
+        group_name = group['group_name']
+        for field_order, (field_name, expected_value) in enumerate(group['fields'].items()):
+            values = expected_value if isinstance(expected_value, list) else [expected_value]
+            expected_rows.append((group_name, field_name, field_order, " or ".join(str(v) for v in values)))
+            accepted_rows.extend((group_name, field_name, str(v)) for v in values)
+    expectations = pd.DataFrame(expected_rows, columns=['group_name', 'field', 'field_order', 'expected'])
+    accepted = pd.DataFrame(accepted_rows, columns=['group_name', 'field', 'value']).drop_duplicates()
+    return expectations, accepted
+
+def _build_applicability(checks, radios):
+    """
+    Expresses the model plans of the (model, type) pairs in `radios` as tables:
+    one row per applicable group, and one row per applicable field.
+    """
+    group_rows = []
+    field_rows = []
+    for model, mobile in radios:
+        for _, group in _get_model_plan(checks, model, mobile):
+            group_rows.append((model, mobile, group['group_name']))
+            field_rows.extend((model, mobile, group['group_name'], field_name) for field_name in group['fields'])
+    groups = pd.DataFrame(group_rows, columns=['model', 'type', 'group_name'], dtype=object)
+    fields = pd.DataFrame(field_rows, columns=['model', 'type', 'group_name', 'field'], dtype=object)
+    return groups, fields
+
+def _match_parents(flat, checks):
+    """Rows of the flattened table that fall under each group's parent element."""
+    frames = []
+    all_node_keys = flat['node_key'].astype(object).fillna("")
+    for group_order, group in enumerate(checks):
+        selector = _compile_selector(group)
+        mask = flat['recset'] == selector['recset']
+        if selector['node_match'] is not None:
+            operation, needle, ci = selector['node_match']
+            node_keys = all_node_keys.map(_fold_key) if ci else all_node_keys
+            if operation == 'equals':
+                mask &= node_keys == needle
+            elif operation == 'starts-with':
+                mask &= node_keys.str.startswith(needle)
+            else:
+                mask &= node_keys.str.contains(needle, regex=False)
+        if selector['embedded_key'] is not None:
+            mask &= flat['embedded_key'] == selector['embedded_key']
+            parent_column = 'embedded_key'
+        elif selector['section'] is not None:
+            mask &= flat['embedded_key'].isna() & (flat['section'] == selector['section'])
+            parent_column = 'section'
+        else:
+            mask &= flat['embedded_key'].isna()
+            parent_column = 'node_key'
+
+        matched = flat.loc[mask, ['serial', 'node_key', 'field', 'value']]
+        matched['parent'] = flat.loc[mask, parent_column] # may be node_key itself
+        matched['group_name'] = group['group_name']
+        matched['group_order'] = group_order
+        matched['context'] = matched['node_key'] if group.get('context_node_name') else "N/A"
+        frames.append(matched)
+
+    matched = pd.concat(frames)
+    matched['position'] = matched.index # document order within the fleet table
+    return matched
+
+def _run_vectorized_checks(flat, file_models, checks=CHECKS_TO_PERFORM):
+    """
+    Runs every group in `checks` over the whole fleet at once, each file only against
+    the groups and fields of its model plan.
+    `file_models` maps serial -> (model, type), in report order.
+    Returns a DataFrame of findings ordered like the per-file checks.
+    """
+    expectations, accepted = _build_expectations(checks)
+    group_names = [group['group_name'] for group in checks]
+    files = pd.DataFrame(list(file_models.values()), columns=['model', 'type'], dtype=object)
+    files.insert(0, 'serial', list(file_models.keys()))
+    files['file_order'] = range(len(files))
+    applicable_groups, applicable_fields = _build_applicability(checks, set(file_models.values()))
+
+    matched = _match_parents(flat, checks)
+    parent_keys = ['serial', 'group_name', 'node_key', 'parent']
+
+    # every parent found, in document order
+    # observed=True: node_key and parent are categorical, so pandas 2 would otherwise pair up every category
+    parents = matched.groupby(parent_keys, sort=False, dropna=False, observed=True).agg(
+        group_order=('group_order', 'first'), context=('context', 'first'), parent_order=('position', 'min')
+    ).reset_index()
+
+    # Section Missing: applicable (serial, group) pairs with no parent at all
+    all_pairs = files[['serial', 'model', 'type']].merge(applicable_groups, on=['model', 'type'])
+    all_pairs = all_pairs.merge(pd.DataFrame({'group_name': group_names, 'group_order': range(len(group_names))}), on='group_name')
+    all_pairs = all_pairs[['serial', 'group_name', 'group_order']]
+    found_pairs = parents[['serial', 'group_name']].drop_duplicates()
+    section_missing = all_pairs.merge(found_pairs, how='left', indicator=True)
+    section_missing = section_missing[section_missing['_merge'] == 'left_only'].drop(columns='_merge')
+    section_missing = section_missing.assign(context="N/A", field="N/A", problem="Section Missing", expected="N/A", actual="N/A", parent_order=-1, field_order=-1)
+
+    # first value of each field under each parent, like .//Field[@Name=...][0]
+    values = matched[matched['field'].notna()].drop_duplicates(parent_keys + ['field'], keep='first')
+    values = values[parent_keys + ['field', 'value']]
+
+    results = parents.merge(expectations, on='group_name')
+    results = results.merge(files[['serial', 'model', 'type']], on='serial')
+    results = results.merge(applicable_fields, on=['model', 'type', 'group_name', 'field'])
+    results = results.merge(values, on=parent_keys + ['field'], how='left')
+    results = results.merge(accepted.assign(valid=True), on=['group_name', 'field', 'value'], how='left')
+
+    missing = results['value'].isna()
+    incorrect = ~missing & results['valid'].isna()
+    results['problem'] = None
+    results.loc[missing, 'problem'] = "Setting Missing"
+    results.loc[incorrect, 'problem'] = "Incorrect Value"
+    results = results[missing | incorrect]
+    results = results.assign(actual=results['value'].where(~missing, "N/A"))
+
+    columns = ['serial', 'group_name', 'context', 'field', 'problem', 'expected', 'actual', 'group_order', 'parent_order', 'field_order']
+    findings = pd.concat([section_missing[columns], results[columns]], ignore_index=True)
+    findings = findings.merge(files[['serial', 'file_order']], on='serial')
+    findings = findings.sort_values(['file_order', 'group_order', 'parent_order', 'field_order'], kind='stable')
+    return findings.reset_index(drop=True)
+
+VECTORIZED_CHUNK_FILES = 500 # files flattened into one table at a time
+
+def _vectorized_columns_needed(checks):
+    """(recset names, field names) the rules in `checks` can look at, so the rest need not be flattened."""
+    recsets = {_compile_selector(group)['recset'] for group in checks}
+    fields = {field for group in checks for field in group['fields']}
+    return recsets, fields
+
+def check_fleet_vectorized(xml_files, report_rows, snapshot_dir=None, checks=CHECKS_TO_PERFORM, talkgroups=True):
+    """
+    Flattens the codeplugs into fleet-wide tables, VECTORIZED_CHUNK_FILES files at a time, and checks
+    `checks` with table operations instead of per-file tree queries. Only the recsets and fields the
+    rules use are kept. With talkgroups, each file's 'Talkgroup Consistency' findings are added as in
+    the tree engine. With a snapshot_dir, unchanged files are loaded from their snapshot instead of re-parsed.
+    Returns the number of files with errors.
+    """
+    recsets, fields = _vectorized_columns_needed(checks)
+    progress = ProgressReporter(xml_files, label="Flattened", show_errors=False)
+    files_with_errors = 0
+    for start in range(0, len(xml_files), VECTORIZED_CHUNK_FILES):
+        files_with_errors += _check_chunk_vectorized(xml_files[start:start + VECTORIZED_CHUNK_FILES], report_rows, snapshot_dir,
+                                                     checks, talkgroups, recsets, fields, progress)
+    progress.finish()
+    METRICS.count('files_with_errors', files_with_errors)
+    return files_with_errors
+
+def _check_chunk_vectorized(xml_files, report_rows, snapshot_dir, checks, talkgroups, recsets, fields, progress):
+    """Checks one chunk of files for check_fleet_vectorized. Findings are per serial, so chunks never interact."""
+    flat_columns = {name: [] for name in FLAT_COLUMNS}
+    file_info = {} # filepath -> (serial, metadata, model, type, talkgroup facts), None if not parsed
+    for filepath in xml_files:
+        try:
+            metadata, columns, talkgroup_facts = _read_codeplug_table(filepath, snapshot_dir, recsets, fields)
+        except ETREE.XMLSyntaxError:
+            print(f"Error: Could not parse XML file '{filepath}'.")
+            file_info[filepath] = None
+            progress.update([filepath])
+            continue
+        progress.update([filepath])
+        serial = os.path.basename(filepath).removesuffix('.xml')
+        model, mobile = _get_model_and_type(serial)
+        file_info[filepath] = (serial, metadata, model, mobile, talkgroup_facts)
+        for name, values in columns.items():
+            flat_columns[name].extend(values)
+        flat_columns['serial'].extend([serial] * len(columns['field']))
+
+    flat = pd.DataFrame(flat_columns, columns=FLAT_COLUMNS)
+    del flat_columns
+    for column in ['recset', 'node_key', 'embedded_key', 'section', 'field']:
+        flat[column] = flat[column].astype('category')
+    file_models = {info[0]: (info[2], info[3]) for info in file_info.values() if info is not None}
+    with METRICS.timed('vectorized_checks'):
+        findings = _run_vectorized_checks(flat, file_models, checks)
+    findings_by_serial = {serial: group for serial, group in findings.groupby('serial', sort=False, observed=True)}
+
+    files_with_errors = 0
+    for filepath, info in file_info.items():
+        if info is None:
+            report_rows.append(_parse_error_row(filepath))
+            files_with_errors += 1
+            continue
+        serial, metadata, model, mobile, (definitions, usages) = info
+        file_rows = []
+        file_findings = findings_by_serial.get(serial)
+        if file_findings is not None:
+            for finding in file_findings.itertuples(index=False):
+                file_rows.append(_finding_row(serial, metadata, finding.context, finding.group_name, finding.field, finding.problem, finding.expected, finding.actual, model, mobile))
+        if talkgroups:
+            file_rows.extend(_talkgroup_error_rows(usages, definitions, metadata, serial, model, mobile))
+        if file_rows:
+            report_rows.extend(file_rows)
+            files_with_errors += 1
+        else:
+            report_rows.append(_success_row(serial, metadata, model, mobile))
+    return files_with_errors
+
+####
+# Event-driven (streaming) validation
+####
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+def _compile_stream_rules(plan):
+    """
+    Indexes a model plan by the element that opens each group's parent:
+    ('EmbeddedNode', ReferenceKey), ('Section', Name) or ('Node', None).
+    """
+    rules_by_element = collections.defaultdict(list)
+    for group_order, group in plan:
+        selector = _compile_selector(group)
+        if selector['embedded_key'] is not None:
+            element_key = ('EmbeddedNode', selector['embedded_key'])
+        elif selector['section'] is not None:
+            element_key = ('Section', selector['section'])
+        else:
+            element_key = ('Node', None)
+        rules_by_element[element_key].append((group_order, group, selector))
+    return dict(rules_by_element)
+
+_STREAM_RULES = {} # (checks key, model, type) -> compiled rules
+
+def _get_stream_rules(checks, model, mobile_hh):
+    key = (_checks_key(checks), model, mobile_hh)
+    rules = _STREAM_RULES.get(key)
+    if rules is None:
+        rules = _STREAM_RULES[key] = _compile_stream_rules(_get_model_plan(checks, model, mobile_hh))
+    return rules
+
+class _StreamFrame:
+    """One open element on the path from the root."""
+    __slots__ = ('tag', 'name', 'ref_key', 'recset', 'node_key', 'is_top_node')
+
+    def __init__(self, tag, name, ref_key, recset, node_key, is_top_node):
+        self.tag = tag
+        self.name = name
+        self.ref_key = ref_key
+        self.recset = recset
+        self.node_key = node_key # ReferenceKey of the Node directly under the Recset
+        self.is_top_node = is_top_node
+
+class _StreamingCheckTarget:
+    """
+    lxml parser target that evaluates the check groups, metadata lookups and talkgroup
+    check from start/end events. Only the open element path is kept, never the tree.
+    close() returns (metadata, findings per group, talkgroup usages, talkgroup definitions).
+    """
 
+    def __init__(self, rules, plan, group_count):
+        self.rules = rules
+        self.plan = plan
+        self.group_count = group_count
+        self.stack = []
+        self.text_parts = None
+        self.open_parents = [] # [depth, group_order, group, context, values, document position]
+        self.parent_count = 0
+        self.parents_by_group = collections.defaultdict(list)
+        self.open_definitions = [] # [depth, ref_key, alias text, seen]
+        self.talkgroup_definitions = {}
+        self.talkgroup_usages = []
+        self.metadata = {"alias": "Unknown", **{key: None for key in UNIT_ID_SYSTEMS}}
+        self.alias_seen = False
+        self.unit_ids_seen = set()
+
+    def start(self, tag, attrib):
+        name = attrib.get('Name')
+        ref_key = attrib.get('ReferenceKey')
+        parent = self.stack[-1] if self.stack else None
+        recset = parent.recset if parent else None
+        node_key = parent.node_key if parent else None
+        is_top_node = False
+        if tag == 'Recset':
+            recset = name
+            node_key = None
+        elif tag == 'Node' and parent is not None and parent.tag == 'Recset':
+            node_key = ref_key
+            is_top_node = True
+        frame = _StreamFrame(tag, name, ref_key, recset, node_key, is_top_node)
+        self.stack.append(frame)
+        depth = len(self.stack)
+
+        if tag == 'Field':
+            self.text_parts = []
+            return
+
+        if tag == 'EmbeddedNode':
+            if name == 'Talkgroup Table' and recset == 'ASTRO Talkgroup List':
+                self.open_definitions.append([depth, ref_key, None, False])
+            candidates = self.rules.get(('EmbeddedNode', ref_key))
+        elif tag == 'Section':
+            candidates = self.rules.get(('Section', name)) if parent is not None and parent.is_top_node else None
+        elif tag == 'Node' and is_top_node:
+            candidates = self.rules.get(('Node', None))
+        else:
+            candidates = None
+
+        for group_order, group, selector in candidates or ():
+            if recset != selector['recset']:
+                continue
+            if selector['node_match'] is not None:
+                operation, needle, ci = selector['node_match']
+                if node_key is None or not CI_MATCHERS[operation](_fold_key(node_key) if ci else node_key, needle):
+                    continue
+            self.open_parents.append([depth, group_order, group, self._context(group), {}, self.parent_count])
+            self.parent_count += 1
+
+    def _context(self, group):
+        context_name = group.get('context_node_name')
+        if context_name:
+            for frame in reversed(self.stack[:-1]):
+                if frame.tag == 'Node' and frame.name == context_name:
+                    return frame.ref_key if frame.ref_key is not None else "N/A"
+        return "N/A"
+
+    def data(self, text):
+        if self.text_parts is not None:
+            self.text_parts.append(text)
+
+    def end(self, tag):
+        depth = len(self.stack)
+        frame = self.stack[-1]
+        if tag == 'Field':
+            self._end_field(frame)
+        else:
+            if self.open_parents and self.open_parents[-1][0] == depth:
+                while self.open_parents and self.open_parents[-1][0] == depth:
+                    parent = self.open_parents.pop()
+                    self.parents_by_group[parent[1]].append(parent)
+            if self.open_definitions and self.open_definitions[-1][0] == depth:
+                _, ref_key, alias_text, _ = self.open_definitions.pop()
+                if ref_key and alias_text is not None:
+                    self.talkgroup_definitions[ref_key] = alias_text.strip()
+        self.stack.pop()
+
+    def _end_field(self, frame):
+        text = "".join(self.text_parts) or None
+        self.text_parts = None
+        field_name = frame.name
+
+        for parent in self.open_parents:
+            if field_name in parent[2]['fields'] and field_name not in parent[4]:
+                parent[4][field_name] = text or ""
+
+        if field_name == RADIO_ALIAS_FIELD and frame.recset == 'Radio Wide' and not self.alias_seen:
+            self.alias_seen = True
+            if text:
+                self.metadata['alias'] = text.strip()
+        elif field_name == 'Unit ID' and frame.recset == 'Trunking System':
+            self._unit_id(text)
+        elif field_name == 'Talkgroup Alias Text':
+            for definition in self.open_definitions:
+                if not definition[3]:
+                    definition[2], definition[3] = text, True
+        elif field_name == 'ASTRO Talkgroup ID':
+            used_id = text.strip() if text else ""
+            context_key = next((f.ref_key for f in reversed(self.stack[:-1]) if f.ref_key is not None), "Unknown Context")
+            self.talkgroup_usages.append((used_id, context_key))
+
+    def _unit_id(self, text):
+        # .//Recset[@Name='Trunking System']/Node[...]/Section[@Name='General']/Field[@Name='Unit ID']
+        if len(self.stack) < 3:
+            return
+        section, node = self.stack[-2], self.stack[-3]
+        if section.tag != 'Section' or section.name != 'General' or not node.is_top_node or node.ref_key is None:
+            return
+        node_key = _fold_key(node.ref_key) # as ci:contains folds it
+        for key, system_name in UNIT_ID_SYSTEMS.items():
+            if key in self.unit_ids_seen or _fold_key(system_name) not in node_key:
+                continue
+            self.unit_ids_seen.add(key)
+            if text:
+                try:
+                    self.metadata[key] = int(text.strip())
+                except (ValueError, TypeError):
+                    print(f"Warning: Could not convert Unit ID for '{system_name}' to an integer.")
+
+    def close(self):
+        group_findings = [[] for _ in range(self.group_count)]
+        for group_order, group in self.plan:
+            findings = group_findings[group_order]
+            parents = self.parents_by_group.get(group_order)
+            if not parents:
+                findings.append(("N/A", group['group_name'], "N/A", "Section Missing", "N/A", "N/A"))
+                continue
+            parents.sort(key=lambda parent: parent[5]) # nested parents close before their ancestors
+            for _, _, _, context, values, _ in parents:
+                for field_name, expected_value in group['fields'].items():
+                    if field_name not in values:
+                        findings.append((context, group['group_name'], field_name, "Setting Missing", _expected_text(expected_value), "N/A"))
+                        continue
+                    is_valid, expected_value_joined = _check_field_value(expected_value, values[field_name])
+                    if not is_valid:
+                        findings.append((context, group['group_name'], field_name, "Incorrect Value", expected_value_joined, values[field_name]))
+        return self.metadata, group_findings, self.talkgroup_usages, self.talkgroup_definitions
+
+def _evaluate_file_streaming(filepath, checks):
+    """
+    Same result as _evaluate_file_tree, evaluated from parser events without building a tree.
+    Raises ETREE.XMLSyntaxError for files that cannot be parsed.
+    """
+    filename = os.path.basename(filepath)
+    serial = filename.removesuffix('.xml')
+    model, mobile = _get_model_and_type(serial)
+    target = _StreamingCheckTarget(_get_stream_rules(checks, model, mobile), _get_model_plan(checks, model, mobile), len(checks))
+    parser = ETREE.XMLParser(target=target, resolve_entities=False)
+
+    with METRICS.timed('stream'), open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            parser.feed(chunk)
+        metadata, group_findings, usages, talkgroup_definitions = parser.close()
+
+    group_rows = [[_finding_row(serial, metadata, *finding, model, mobile) for finding in findings] for findings in group_findings]
+    talkgroup_rows = _talkgroup_error_rows(usages, talkgroup_definitions, metadata, serial, model, mobile)
+    return serial, metadata, model, mobile, group_rows, talkgroup_rows, (talkgroup_definitions, usages)
+
+def check_xml_file_streaming(filepath, report_rows):
+    """
+    Same findings as check_xml_file, evaluated from parser events without building a tree.
+    Returns True if the file has errors.
+    """
+    try:
+        result = _evaluate_file_streaming(filepath, CHECKS_TO_PERFORM)
     except ETREE.XMLSyntaxError:
-        # this should not happen due to prior validation
         print(f"Error: Could not parse XML file '{filepath}'.")
-        report_rows.append([os.path.basename(filepath), "Error!", "Alias", "ID", "Setting", "Ref", "Group", "Could not parse XML", "Expect", "Actual", "model", "type", "Dekalb", "TD-Dek","Fulton","TD-Ful","Atlanta","TD-Atl","Cobb", "TD-Cobb", "Hall", "TD-Hall", "TD-Gw-ID", "TD-Alias"])
+        report_rows.append(_parse_error_row(filepath))
         return True
+    return _record_file_result(result, report_rows)
+
+####
+# Triage mode
+####
+
+TALKGROUP_GROUP_NAME = "Talkgroup Consistency"
+TRIAGE_REORDER_EVERY = 50 # files between re-ranking the check order
+
+# placeholder metadata; triage only needs to know whether a group fails
+_TRIAGE_METADATA = {"alias": "", **{key: None for key in UNIT_ID_SYSTEMS}}
+
+def _load_triage_stats(stats_path):
+    try:
+        with open(stats_path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Warning: Ignoring triage stats '{stats_path}': {e}")
+        return {}
+
+def _save_triage_stats(stats_path, stats):
+    temp_path = f"{stats_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=1)
+    os.replace(temp_path, stats_path)
+
+def _triage_order(checks, stats):
+    """
+    Orders the check groups and the talkgroup check so the likeliest failures
+    per second of work come first, using failure rates and timings from past runs.
+    """
+    candidates = [(group['group_name'], group) for group in checks] + [(TALKGROUP_GROUP_NAME, None)]
+    known_costs = sorted(s['seconds'] / s['evaluations'] for s in stats.values() if s.get('evaluations'))
+    default_cost = known_costs[len(known_costs) // 2] if known_costs else 1.0
+
+    def score(candidate):
+        s = stats.get(candidate[0], {})
+        evaluations = s.get('evaluations', 0)
+        failure_rate = (s.get('failures', 0) + 1) / (evaluations + 2) # unseen groups start at 1/2
+        cost = s['seconds'] / evaluations if evaluations else default_cost
+        return failure_rate / max(cost, 1e-6)
+
+    return sorted(candidates, key=score, reverse=True)
+
+def triage_xml_file(filepath, order, stats):
+    """
+    Runs checks in `order` until the first failure and records per-group outcomes in stats.
+    Returns (serial, "PASS"/"FAIL", first failing group).
+    """
+    filename = os.path.basename(filepath)
+    serial = filename.removesuffix('.xml')
+    try:
+        with METRICS.timed('parse'):
+            parser = ETREE.XMLParser(remove_blank_text=True, resolve_entities=False)
+            root = ETREE.parse(filepath, parser).getroot()
+    except ETREE.XMLSyntaxError:
+        print(f"Error: Could not parse XML file '{filepath}'.")
+        return serial, "FAIL", "Could not parse XML"
+    model, mobile = _get_model_and_type(serial)
+    applicable = {group['group_name']: group for _, group in _get_model_plan(CHECKS_TO_PERFORM, model, mobile)}
+
+    for group_name, group in order:
+        if group is not None:
+            group = applicable.get(group_name)
+            if group is None:
+                continue # does not apply to this model/type
+        started = time.perf_counter()
+        if group is None:
+            failed = bool(_validate_talkgroup_match(root, _TRIAGE_METADATA, serial, model, mobile))
+        else:
+            failed = bool(_process_check_group(root, group, _TRIAGE_METADATA, serial, model, mobile))
+        group_stats = stats.setdefault(group_name, {'evaluations': 0, 'failures': 0, 'seconds': 0.0})
+        group_stats['evaluations'] += 1
+        group_stats['failures'] += failed
+        group_stats['seconds'] += time.perf_counter() - started
+        if failed:
+            return serial, "FAIL", group_name
+    return serial, "PASS", ""
+
+def run_triage(xml_files, stats_path):
+    """
+    Pass/fail for each file, stopping at its first failure. Returns a DataFrame.
+    The learned stats are saved at every re-ranking and when the run ends, even if it is interrupted.
+    """
+    stats = _load_triage_stats(stats_path)
+    results = []
+    progress = ProgressReporter(xml_files, label="Triaged")
+    try:
+        for i, filepath in enumerate(xml_files):
+            if i % TRIAGE_REORDER_EVERY == 0:
+                if i:
+                    _save_triage_stats(stats_path, stats)
+                order = _triage_order(CHECKS_TO_PERFORM, stats)
+            results.append(triage_xml_file(filepath, order, stats))
+            progress.update([filepath], results[-1][1] == "FAIL")
+    finally:
+        _save_triage_stats(stats_path, stats)
+    progress.finish()
+    return pd.DataFrame(results, columns=['Serial', 'Result', 'First Failure'])
+
+####
+# Sampling audit
+####
+
+AUDIT_ROUND_FILES = 200 # smallest sample added per round
+AUDIT_FILE_ERRORS = "Could not check"
+AUDIT_ANY = "Any finding"
+
+def _audit_stratum(filepath):
+    """Serial prefix with the model and type it implies; descriptive filenames are grouped by model and type."""
+    serial = os.path.basename(filepath).removesuffix('.xml')
+    model, mobile = _get_model_and_type(serial)
+    prefix = serial[:3] if len(serial) == 10 else "other"
+    return f"{prefix} ({model} {mobile})"
+
+def _proportional_allocation(sizes, total):
+    """
+    Splits a sample of `total` across strata in proportion to their sizes (largest remainder),
+    at least one per stratum and at most the stratum's size.
+    """
+    population = sum(sizes.values())
+    quotas = {name: total * size / population for name, size in sizes.items()}
+    allocation = {name: min(size, max(1, int(quotas[name]))) for name, size in sizes.items()}
+    leftover = total - sum(allocation.values())
+    while leftover < 0: # the minimum of one per stratum overshot; take back from the strata furthest over their quota
+        over = [name for name in allocation if allocation[name] > 1]
+        if not over:
+            break
+        allocation[max(over, key=lambda name: allocation[name] - quotas[name])] -= 1
+        leftover += 1
+    for name in sorted(quotas, key=lambda name: quotas[name] - int(quotas[name]), reverse=True):
+        if leftover <= 0:
+            break
+        if allocation[name] < sizes[name]:
+            allocation[name] += 1
+            leftover -= 1
+    return allocation
+
+def _audit_failures(rows, filepaths):
+    """{serial: names of the groups it fails} for the checked files."""
+    failures = {os.path.basename(filepath).removesuffix('.xml'): set() for filepath in filepaths}
+    for row in rows:
+        problem = row[6]
+        if problem == "OK":
+            continue
+        group_name = AUDIT_FILE_ERRORS if problem in FILE_ERROR_PROBLEMS else row[4]
+        failures[str(row[0]).removesuffix('.xml')].add(group_name)
+    return failures
+
+def _stratified_rate(strata, failures, failed, z):
+    """
+    Stratified estimate of the share of radios for which failed(groups) is true, with a Wilson
+    interval on the design's effective sample size. strata: {name: (radios, sampled serials)}.
+    Returns (estimate, low, high).
+    """
+    population = sum(size for size, _ in strata.values())
+    estimate = variance = 0.0
+    sampled = 0
+    for size, serials in strata.values():
+        n = len(serials)
+        if n == 0:
+            continue
+        rate = sum(failed(failures[serial]) for serial in serials) / n
+        weight = size / population
+        estimate += weight * rate
+        if n > 1:
+            variance += weight ** 2 * (1 - n / size) * rate * (1 - rate) / (n - 1)
+        sampled += n
+    if sampled == population: # a census has no sampling error
+        return estimate, estimate, estimate
+    n_eff = estimate * (1 - estimate) / variance if variance > 0 else sampled
+    center = (estimate + z * z / (2 * n_eff)) / (1 + z * z / n_eff)
+    half_width = z * math.sqrt(estimate * (1 - estimate) / n_eff + z * z / (4 * n_eff * n_eff)) / (1 + z * z / n_eff)
+    return estimate, max(0.0, center - half_width), min(1.0, center + half_width)
+
+def _audit_estimates(strata, failures, z):
+    population = sum(size for size, _ in strata.values())
+    group_names = [group['group_name'] for group in CHECKS_TO_PERFORM] + [TALKGROUP_GROUP_NAME, AUDIT_FILE_ERRORS]
+    tests = [(name, lambda groups, name=name: name in groups) for name in group_names] + [(AUDIT_ANY, bool)]
+    rows = []
+    for name, failed in tests:
+        estimate, low, high = _stratified_rate(strata, failures, failed, z)
+        failing = sum(failed(groups) for groups in failures.values())
+        rows.append((name, len(failures), failing, estimate, low, high, round(estimate * population)))
+    return pd.DataFrame(rows, columns=['Group', 'Sampled', 'Failing In Sample', 'Estimated Rate', 'Low', 'High', 'Estimated Radios'])
+
+def run_audit(xml_files, precision, confidence=0.95, seed=None, workers=1):
+    """
+    Estimates per-group failure rates from a stratified random sample, adding to the sample
+    until every confidence interval is within +/- precision (or every file has been checked).
+    Returns (estimates DataFrame, strata DataFrame).
+    """
+    rng = random.Random(seed)
+    by_stratum = collections.defaultdict(list)
+    for filepath in xml_files:
+        by_stratum[_audit_stratum(filepath)].append(filepath)
+    for files in by_stratum.values():
+        rng.shuffle(files) # each stratum's sample is a prefix of its shuffled files, so it can grow
+    sizes = {name: len(files) for name, files in by_stratum.items()}
+    taken = dict.fromkeys(by_stratum, 0)
+    plan = _build_profile_plan([DEFAULT_PROFILE])
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    failures = {}
+    target = min(len(xml_files), max(AUDIT_ROUND_FILES, len(by_stratum)))
+
+    while True:
+        allocation = _proportional_allocation(sizes, target)
+        batch = []
+        for name, files in by_stratum.items():
+            batch.extend(files[taken[name]:max(taken[name], allocation[name])])
+            taken[name] = max(taken[name], allocation[name])
+        if workers > 1:
+            profile_rows, _ = check_files_parallel(batch, plan, 'tree', workers)
+            rows = profile_rows[DEFAULT_PROFILE].itertuples(index=False)
+        else:
+            rows = check_files(batch, plan, 'tree')[0][DEFAULT_PROFILE]
+        failures.update(_audit_failures(rows, batch))
+
+        strata = {name: (sizes[name], [os.path.basename(f).removesuffix('.xml') for f in files[:taken[name]]]) for name, files in by_stratum.items()}
+        estimates = _audit_estimates(strata, failures, z)
+        widest = ((estimates['High'] - estimates['Low']) / 2).max()
+        print(f"Sampled {len(failures)} of {len(xml_files)} radios: widest {confidence:.0%} interval is +/-{widest:.1%}")
+        if widest <= precision or len(failures) == len(xml_files):
+            break
+        # the half-width shrinks with the square root of the sample size
+        target = min(len(xml_files), len(failures) + max(AUDIT_ROUND_FILES, math.ceil(len(failures) * ((widest / precision) ** 2 - 1))))
+
+    strata_table = pd.DataFrame([(name, sizes[name], taken[name]) for name in sorted(by_stratum)], columns=['Stratum', 'Radios', 'Sampled'])
+    return estimates, strata_table
+
+def _write_audit_report(report_filename, estimates, strata, confidence):
+    with pd.ExcelWriter(report_filename, engine='openpyxl') as writer:
+        for sheet_name, df in [(f"Estimates ({confidence:.0%} CI)", estimates), ("Strata", strata)]:
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            worksheet = writer.sheets[sheet_name]
+            _style_header(worksheet)
+            for column in ('Estimated Rate', 'Low', 'High'):
+                if column in df.columns:
+                    for cell in worksheet[worksheet.cell(row=1, column=df.columns.get_loc(column) + 1).column_letter][1:]:
+                        cell.number_format = '0.0%'
+            worksheet.freeze_panes = "B2"
+            adjust_column_width(worksheet)
+    print(f"Audit report saved: {report_filename}")
+
+####
+# Isolated file checking
+####
+
+def _limit_memory(memory_mb):
+    try:
+        import resource
+    except ImportError: # not available on Windows
+        print("Warning: --file-memory-mb is not supported on this platform; only the timeout applies.")
+        return
+    limit = memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def _isolated_worker(conn, plan, engine, memory_mb):
+    """Worker process loop: receives file paths, sends back each file's profile rows and talkgroup facts."""
+    if memory_mb:
+        _limit_memory(memory_mb)
+    while True:
+        filepath = conn.recv()
+        if filepath is None:
+            break
+        profile_rows = {name: [] for name in plan[1]}
+        talkgroup_facts = {}
+        failed = check_xml_file_profiles(filepath, profile_rows, plan, engine, talkgroup_facts)
+        conn.send((profile_rows, failed, talkgroup_facts[filepath], METRICS.drain()))
+
+class _IsolatedChecker:
+    """
+    Checks files one at a time in a worker process under a wall-clock and memory budget.
+    A worker that hangs or dies is replaced, and its file reported as "Could not check".
+    """
+
+    def __init__(self, plan, engine, timeout=None, memory_mb=None):
+        self.plan = plan
+        self.engine = engine
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.process = None
+        self.conn = None
+
+    def _start(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_isolated_worker, args=(child_conn, self.plan, self.engine, self.memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def _kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.process = None
+
+    def check(self, filepath, profile_rows, talkgroup_facts=None):
+        """Same contract as check_xml_file_profiles."""
+        if self.process is None:
+            self._start()
+        self.conn.send(filepath)
+
+        reason = None
+        try:
+            if self.conn.poll(self.timeout):
+                rows, failed, facts, metrics = self.conn.recv()
+                for name, file_rows in rows.items():
+                    profile_rows[name].extend(file_rows)
+                if talkgroup_facts is not None:
+                    talkgroup_facts[filepath] = facts
+                METRICS.merge(metrics)
+                return failed
+            reason = f"timed out after {self.timeout} s"
+        except (EOFError, ConnectionError): # the worker died mid-file
+            self.process.join()
+            reason = f"worker crashed (exit code {self.process.exitcode})"
+
+        print(f"Error: Could not check '{filepath}': {reason}")
+        self._kill()
+        if talkgroup_facts is not None:
+            talkgroup_facts[filepath] = None
+        for name in self.plan[1]:
+            profile_rows[name].append(_could_not_check_row(filepath, reason))
+        return set(self.plan[1])
+
+    def close(self):
+        if self.process is not None:
+            self.conn.send(None)
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self._kill()
+            self.process = None
+
+def check_files(xml_files, plan, engine, file_timeout=None, file_memory_mb=None, talkgroup_facts=None, journal=None):
+    """
+    Checks files one after another, in a worker process when a timeout or memory budget is set.
+    With a journal, each file's results are recorded there as soon as it is checked.
+    Returns ({profile name: report rows}, Counter of files with errors per profile).
+    """
+    profile_rows = {name: [] for name in plan[1]}
+    profile_errors = collections.Counter()
+    checker = None
+    if file_timeout or file_memory_mb:
+        checker = _IsolatedChecker(plan, engine, file_timeout, file_memory_mb)
+    progress = ProgressReporter(xml_files)
+    try:
+        for filepath in xml_files:
+            checked = {name: len(rows) for name, rows in profile_rows.items()}
+            if checker:
+                failed = checker.check(filepath, profile_rows, talkgroup_facts)
+            else:
+                failed = check_xml_file_profiles(filepath, profile_rows, plan, engine, talkgroup_facts)
+            profile_errors.update(failed)
+            if journal:
+                journal.record([filepath], {name: _encode_rows(rows[checked[name]:]) for name, rows in profile_rows.items()}, failed,
+                               {filepath: talkgroup_facts[filepath]} if talkgroup_facts is not None else None)
+            progress.update([filepath], bool(failed))
+    finally:
+        if checker:
+            checker.close()
+    progress.finish()
+    return profile_rows, profile_errors
+
+####
+# Parallel checking
+####
+
+PARALLEL_CHUNK_FILES = 16 # files per worker task
+
+def _encode_rows(rows, columns=XML_HEADER):
+    """
+    Dictionary-encodes report rows into one (codes, values) pair per column,
+    so a batch crosses the process boundary as a few arrays instead of a Python object per cell.
+    """
+    values_by_column = list(zip(*rows)) if rows else [()] * len(columns)
+    batch = {}
+    for name, values in zip(columns, values_by_column):
+        codes, uniques = pd.factorize(np.array(values, dtype=object))
+        batch[name] = (codes.astype(np.int32), list(uniques))
+    return batch
+
+def _decode_batches(batches, columns=XML_HEADER):
+    """Concatenates encoded batches straight into a report DataFrame."""
+    data = {}
+    for name in columns:
+        parts = [pd.Categorical.from_codes(batch[name][0], categories=pd.Index(batch[name][1], dtype=object)) for batch in batches]
+        column = union_categoricals(parts) if parts else pd.Categorical([], categories=pd.Index([], dtype=object))
+        # the TD columns are overwritten by the TD merge, so keep them as plain values
+        data[name] = pd.Series(np.asarray(column, dtype=object), dtype=object) if name.startswith('TD-') else column
+    return pd.DataFrame(data, columns=columns)
+
+def _check_files_batch(job):
+    filepaths, plan, engine, collect_talkgroups = job
+    profile_rows = {name: [] for name in plan[1]}
+    failed = collections.Counter()
+    files_with_errors = 0
+    talkgroup_facts = {} if collect_talkgroups else None
+    for filepath in filepaths:
+        file_failed = check_xml_file_profiles(filepath, profile_rows, plan, engine, talkgroup_facts)
+        failed.update(file_failed)
+        files_with_errors += bool(file_failed)
+    encoded = {name: _encode_rows(rows) for name, rows in profile_rows.items()}
+    return encoded, failed, files_with_errors, talkgroup_facts, METRICS.drain()
+
+def check_files_parallel(xml_files, plan, engine, workers, talkgroup_facts=None, journal=None):
+    """
+    Checks files across worker processes, recording each finished batch in the journal if there is one.
+    Returns ({profile name: report DataFrame}, Counter of files with errors per profile).
+    """
+    collect_talkgroups = talkgroup_facts is not None
+    jobs = [(xml_files[i:i + PARALLEL_CHUNK_FILES], plan, engine, collect_talkgroups) for i in range(0, len(xml_files), PARALLEL_CHUNK_FILES)]
+    batches = {name: [] for name in plan[1]}
+    profile_errors = collections.Counter()
+    progress = ProgressReporter(xml_files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (encoded, failed, files_with_errors, facts, metrics), job in zip(pool.map(_check_files_batch, jobs), jobs):
+            for name, batch in encoded.items():
+                batches[name].append(batch)
+            profile_errors.update(failed)
+            if collect_talkgroups:
+                talkgroup_facts.update(facts)
+            if journal:
+                journal.record(job[0], encoded, failed, facts)
+            METRICS.merge(metrics)
+            progress.update(job[0], files_with_errors)
+    progress.finish()
+    return {name: _decode_batches(name_batches) for name, name_batches in batches.items()}, profile_errors
+
+####
+# Memory-aware adaptive concurrency
+####
+
+MEMORY_EXPANSION_FACTOR = 12 # starting guess: bytes of worker memory per byte of XML while a tree is parsed
+
+class _MemoryBudget:
+    """
+    Decides how many files can be in flight at once under a memory ceiling.
+    A file is estimated at its size times an expansion factor learned from what workers report.
+    The committed total is this process, every worker's last reported memory, and the estimates of files in flight.
+    """
+
+    def __init__(self, ceiling_bytes, workers):
+        self.ceiling = ceiling_bytes
+        self.workers = workers
+        self.factor = MEMORY_EXPANSION_FACTOR
+        self.startup_rss = _current_rss() or 0 # stand-in for workers that have not reported yet
+        self.worker_rss = {} # pid -> resident memory after its last file
+        self.in_flight = 0 # bytes estimated for submitted files
+        self.started_workers = 0
+
+    def estimate(self, size):
+        return int(size * self.factor)
+
+    def committed(self):
+        unreported = max(self.started_workers - len(self.worker_rss), 0)
+        return (_current_rss() or self.startup_rss) + sum(self.worker_rss.values()) + unreported * self.startup_rss + self.in_flight
+
+    def room(self):
+        """Bytes of XML that still fit under the ceiling."""
+        return (self.ceiling - self.committed()) / self.factor
+
+    def submitted(self, size, running):
+        self.in_flight += self.estimate(size)
+        self.started_workers = min(self.workers, max(self.started_workers, running + 1))
+
+    def finished(self, size, estimate, pid, growth, rss):
+        self.in_flight -= estimate
+        if rss:
+            self.worker_rss[pid] = rss
+        if growth and size:
+            sample = growth / size
+            # go up at once, come down slowly: an underestimate costs far more than an overestimate
+            self.factor = sample if sample > self.factor else 0.95 * self.factor + 0.05 * sample
+
+def _check_file_measured(job):
+    """Checks one file in a worker and reports how much the worker's memory grew while doing it."""
+    filepath, plan, engine, collect_talkgroups = job
+    warm = METRICS.track_rss # a worker's first file also pays for one-time allocations; don't learn from it
+    METRICS.track_rss = True
+    baseline = _current_rss() or 0
+    METRICS.rss_high = baseline
+    profile_rows = {name: [] for name in plan[1]}
+    talkgroup_facts = {} if collect_talkgroups else None
+    failed = check_xml_file_profiles(filepath, profile_rows, plan, engine, talkgroup_facts)
+    growth = METRICS.rss_high - baseline if baseline and warm else None
+    facts = talkgroup_facts[filepath] if collect_talkgroups else None
+    return profile_rows, failed, facts, METRICS.drain(), os.getpid(), growth, _current_rss()
+
+def check_files_adaptive(xml_files, plan, engine, workers, memory_ceiling_mb, talkgroup_facts=None, journal=None):
+    """
+    Checks files in up to `workers` processes, starting each file only while the memory estimate
+    stays under memory_ceiling_mb. The largest waiting file that fits goes first, so big files
+    run when there is room and small ones fill the gaps. With a journal, each file is recorded as it finishes.
+    Returns ({profile name: report rows}, Counter of files with errors per profile).
+    """
+    budget = _MemoryBudget(memory_ceiling_mb * 1024 * 1024, workers)
+    progress = ProgressReporter(xml_files)
+    sizes = progress.sizes
+    order = {filepath: i for i, filepath in enumerate(xml_files)}
+    waiting = sorted(xml_files, key=lambda filepath: sizes[filepath]) # largest last
+    waiting_sizes = [sizes[filepath] for filepath in waiting]
+    collect_talkgroups = talkgroup_facts is not None
+    results = {}
+    profile_errors = collections.Counter()
+    running = {} # future -> (filepath, estimate)
+    peak_running = 0
+    warned = False
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while waiting or running:
+            # admit the largest waiting files that fit
+            while waiting and len(running) < workers:
+                room = budget.room()
+                i = bisect.bisect_right(waiting_sizes, room) - 1
+                if i < 0:
+                    if running:
+                        break
+                    i = len(waiting) - 1 # always make progress, even with a file bigger than the budget
+                    if not warned:
+                        print(f"Warning: '{os.path.basename(waiting[i])}' may not fit under the memory ceiling; checking it alone.")
+                        warned = True
+                filepath = waiting.pop(i)
+                waiting_sizes.pop(i)
+                future = pool.submit(_check_file_measured, (filepath, plan, engine, collect_talkgroups))
+                running[future] = (filepath, budget.estimate(sizes[filepath]))
+                budget.submitted(sizes[filepath], len(running) - 1)
+            peak_running = max(peak_running, len(running))
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                filepath, estimate = running.pop(future)
+                rows, failed, facts, metrics, pid, growth, rss = future.result()
+                budget.finished(sizes[filepath], estimate, pid, growth, rss)
+                results[filepath] = rows
+                profile_errors.update(failed)
+                if collect_talkgroups:
+                    talkgroup_facts[filepath] = facts
+                if journal:
+                    journal.record([filepath], {name: _encode_rows(file_rows) for name, file_rows in rows.items()}, failed,
+                                   {filepath: facts} if collect_talkgroups else None)
+                METRICS.merge(metrics)
+                progress.update([filepath], bool(failed))
+    progress.finish()
+    print(f"Up to {peak_running} files at once; learned {budget.factor:.1f} bytes of memory per byte of XML.")
+
+    profile_rows = {name: [] for name in plan[1]}
+    for filepath in sorted(results, key=order.get): # report in folder order, not completion order
+        for name, rows in results[filepath].items():
+            profile_rows[name].extend(rows)
+    return profile_rows, profile_errors
+
+####
+# Run journal
+####
+
+JOURNAL_VERSION = 1 # bump when the entry layout changes
+
+class RunJournal:
+    """
+    Append-only record of a run, written as it goes: one entry per checked file or batch of files,
+    holding their content hashes, encoded report rows, failing profiles and talkgroup facts.
+    A resumed run skips files whose entry still matches, and the report is read back from the journal.
+    Entries are pickles, so loading a journal runs whatever it contains: only resume from one you wrote.
+    """
+
+    def __init__(self, path, profiles, talkgroups, resume=False):
+        self.path = path
+        self.header = {'version': JOURNAL_VERSION, 'profiles': list(profiles), 'talkgroups': talkgroups}
+        self.entry_files = [] # [(filepath, content hash)] per entry, in journal order
+        self._hashes = {}
+        header, end = None, 0
+        if resume:
+            if not os.path.exists(path):
+                print(f"No journal at '{path}'; checking every file.")
+            for record, end in self._records():
+                if header is None:
+                    header = record
+                else:
+                    self.entry_files.append(record['files'])
+            if header is not None and header != self.header:
+                raise ValueError(f"journal '{path}' was written with different --profiles or --talkgroup-index; run without --resume to start over")
+        if header is None:
+            self.entry_files = []
+            self.file = open(path, 'wb')
+            self._write(self.header)
+        else:
+            self.file = open(path, 'r+b')
+            self.file.truncate(end) # drop a record cut short by the interruption
+            self.file.seek(end)
+
+    def _records(self):
+        """Yields (record, offset just past it) for every complete record in the journal."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    return
+                except (pickle.UnpicklingError, AttributeError, ValueError, IndexError):
+                    print(f"Warning: Ignoring the unreadable end of journal '{self.path}'.")
+                    return
+                yield record, f.tell()
+
+    def _write(self, record):
+        pickle.dump(record, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.file.flush() # on disk before the next file is checked, so a crash loses at most one entry
+
+    def file_hash(self, filepath):
+        if filepath not in self._hashes:
+            self._hashes[filepath] = _file_hash(filepath)
+        return self._hashes[filepath]
+
+    def record(self, filepaths, encoded, failed, talkgroup_facts=None):
+        """
+        Appends the results of checking filepaths: {profile name: encoded rows}, the profiles
+        (or Counter of files per profile) that failed, and {filepath: talkgroup facts} if collected.
+        """
+        files = [(filepath, self.file_hash(filepath)) for filepath in filepaths]
+        self._write({'files': files, 'rows': encoded, 'failed': collections.Counter(failed), 'talkgroups': talkgroup_facts})
+        self.entry_files.append(files)
+
+    def _usable_entries(self, xml_files):
+        """Indexes of entries whose files are all still here and unchanged, and were not checked again later."""
+        current = set(xml_files)
+        seen = set()
+        usable = set()
+        for i in range(len(self.entry_files) - 1, -1, -1):
+            files = self.entry_files[i]
+            if all(filepath in current and filepath not in seen and self.file_hash(filepath) == digest for filepath, digest in files):
+                usable.add(i)
+            seen.update(filepath for filepath, _ in files)
+        return usable
+
+    def pending(self, xml_files):
+        """The files in xml_files the journal has no usable results for."""
+        done = {filepath for i in self._usable_entries(xml_files) for filepath, _ in self.entry_files[i]}
+        if done:
+            print(f"Resuming: {len(done)} of {len(xml_files)} files already checked in '{self.path}'.")
+            METRICS.count('files_resumed', len(done))
+        return [filepath for filepath in xml_files if filepath not in done]
+
+    def results(self, xml_files):
+        """
+        Reads the usable entries back in folder order.
+        Returns ({profile name: report DataFrame}, Counter of files with errors per profile,
+        {filepath: talkgroup facts} or None if the run did not collect them).
+        """
+        self.file.flush()
+        usable = self._usable_entries(xml_files)
+        order = {filepath: i for i, filepath in enumerate(xml_files)}
+        entries = [record for i, (record, _) in enumerate(itertools.islice(self._records(), 1, None)) if i in usable]
+        entries.sort(key=lambda entry: min(order[filepath] for filepath, _ in entry['files']))
+        batches = {name: [] for name in self.header['profiles']}
+        profile_errors = collections.Counter()
+        talkgroup_facts = {} if self.header['talkgroups'] else None
+        for entry in entries:
+            for name, batch in entry['rows'].items():
+                batches[name].append(batch)
+            profile_errors.update(entry['failed'])
+            if talkgroup_facts is not None:
+                talkgroup_facts.update(entry['talkgroups'])
+        return {name: _decode_batches(name_batches) for name, name_batches in batches.items()}, profile_errors, talkgroup_facts
+
+    def close(self):
+        self.file.close()
+
+####
+# Distributed checking over a shared work queue
+####
+
+QUEUE_DB = 'queue.sqlite'
+QUEUE_BATCH_FILES = 16
+QUEUE_LEASE_SECONDS = 300 # machine clocks must agree to well within this
+QUEUE_POLL_SECONDS = 5
+QUEUE_MAX_ATTEMPTS = 3 # a file whose worker dies this many times is reported as "Could not check"
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    seq INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    batch TEXT,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, lease_expires, seq);
+CREATE INDEX IF NOT EXISTS tasks_batch ON tasks (batch);
+CREATE TABLE IF NOT EXISTS results (
+    batch TEXT PRIMARY KEY,
+    result TEXT NOT NULL -- JSON from _encode_queue_result
+);
+"""
+
+def _open_queue(queue_dir):
+    os.makedirs(queue_dir, exist_ok=True)
+    # autocommit mode; claims and completions use explicit BEGIN IMMEDIATE transactions
+    conn = sqlite3.connect(os.path.join(queue_dir, QUEUE_DB), timeout=60, isolation_level=None)
+    conn.executescript(QUEUE_SCHEMA)
+    return conn
+
+def _queue_path(queue_dir, filepath):
+    """filepath relative to queue_dir, so every machine can resolve it; absolute if it is on another drive."""
+    filepath = os.path.abspath(filepath)
+    try:
+        return os.path.relpath(filepath, queue_dir)
+    except ValueError: # Windows: no relative path between drives
+        return filepath
+
+def enqueue_files(queue_dir, xml_files, profiles, engine):
+    """Starts a fresh queue holding xml_files."""
+    conn = _open_queue(queue_dir)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM tasks")
+        conn.execute("DELETE FROM settings")
+        conn.execute("DELETE FROM results")
+        conn.executemany("INSERT INTO settings (key, value) VALUES (?, ?)",
+                         [('profiles', json.dumps(profiles)), ('engine', engine)])
+        conn.executemany("INSERT OR IGNORE INTO tasks (path) VALUES (?)",
+                         ((_queue_path(queue_dir, filepath),) for filepath in xml_files))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def _fail_exhausted_tasks(conn, now):
+    """Gives up on tasks whose lease expired QUEUE_MAX_ATTEMPTS times, so a file that kills its worker is not retried forever."""
+    conn.execute("UPDATE tasks SET status = 'failed', lease_expires = NULL WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                 (now, QUEUE_MAX_ATTEMPTS))
+
+def _claim_batch(conn, worker_id, batch_size, lease_seconds):
+    """
+    Leases up to batch_size pending tasks. A task being retried is leased on its own,
+    so a file that kills its worker cannot take a whole batch down with it again.
+    Returns (batch id, [(seq, path)]).
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _fail_exhausted_tasks(conn, now)
+        tasks = conn.execute(
+            "SELECT seq, path FROM tasks WHERE attempts > 0 AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) ORDER BY seq LIMIT 1",
+            (now,),
+        ).fetchall()
+        if not tasks:
+            tasks = conn.execute("SELECT seq, path FROM tasks WHERE status = 'pending' ORDER BY seq LIMIT ?", (batch_size,)).fetchall()
+        batch_id = f"{worker_id}-{uuid.uuid4().hex[:12]}"
+        conn.executemany(
+            "UPDATE tasks SET status = 'leased', batch = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE seq = ?",
+            ((batch_id, worker_id, now + lease_seconds, seq) for seq, _ in tasks),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return batch_id, tasks
+
+def _encode_queue_result(result):
+    """
+    A batch's results as JSON for the results table. The queue sits on a share anyone may write to,
+    so results are plain data the coordinator can read without running anything (unlike a pickle).
+    """
+    def plain(value):
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"cannot store {type(value).__name__} in the queue")
+    batches = {name: {column: [codes.tolist(), uniques] for column, (codes, uniques) in batch.items()}
+               for name, batch in result['batches'].items()}
+    return json.dumps({**result, 'batches': batches}, default=plain)
+
+def _decode_queue_result(text):
+    """The inverse of _encode_queue_result. Raises ValueError if text is not a batch result."""
+    result = json.loads(text)
+    try:
+        result['batches'] = {name: {column: (np.asarray(codes, dtype=np.int32), uniques) for column, (codes, uniques) in batch.items()}
+                             for name, batch in result['batches'].items()}
+        result['failed'] = collections.Counter(result['failed'])
+        result['talkgroup_facts'] = {filepath: None if facts is None else (facts[0], [tuple(usage) for usage in facts[1]])
+                                     for filepath, facts in result['talkgroup_facts'].items()}
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        raise ValueError(f"not a batch result: {e}") from e
+    return result
+
+def _complete_batch(conn, batch_id, task_count, result):
+    """
+    Marks a batch done and stores its result (from _encode_queue_result) if this worker still holds every lease.
+    Returns False if a lease was lost.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    held = conn.execute("SELECT COUNT(*) FROM tasks WHERE batch = ? AND status = 'leased'", (batch_id,)).fetchone()[0]
+    if held == task_count:
+        conn.execute("UPDATE tasks SET status = 'done', lease_expires = NULL WHERE batch = ?", (batch_id,))
+        conn.execute("INSERT OR REPLACE INTO results (batch, result) VALUES (?, ?)", (batch_id, result))
+    else: # another worker took over part of the batch; hand the rest back
+        conn.execute("UPDATE tasks SET status = 'pending', batch = NULL, lease_expires = NULL WHERE batch = ? AND status = 'leased'", (batch_id,))
+    conn.execute("COMMIT")
+    return held == task_count
+
+def _queue_remaining(conn):
+    return conn.execute("SELECT COUNT(*) FROM tasks WHERE status NOT IN ('done', 'failed')").fetchone()[0]
+
+def run_queue_worker(queue_dir, worker_id=None, batch_size=QUEUE_BATCH_FILES, lease_seconds=QUEUE_LEASE_SECONDS):
+    """
+    Claims batches of files from the queue, checks them and stores each batch's results in the queue,
+    until no work is left. Files whose lease expires are picked up again by any worker.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    conn = _open_queue(queue_dir)
+    try:
+        settings = dict(conn.execute("SELECT key, value FROM settings").fetchall())
+        plan = _build_profile_plan(json.loads(settings['profiles']))
+        engine = settings['engine']
+        while True:
+            batch_id, tasks = _claim_batch(conn, worker_id, batch_size, lease_seconds)
+            if not tasks:
+                if _queue_remaining(conn) == 0:
+                    break
+                time.sleep(QUEUE_POLL_SECONDS) # other workers hold the rest; wait for them or their leases to expire
+                continue
+
+            profile_rows = {name: [] for name in plan[1]}
+            failed = collections.Counter()
+            files_with_errors = 0
+            talkgroup_facts = {}
+            for _, path in tasks:
+                file_failed = check_xml_file_profiles(os.path.join(queue_dir, path), profile_rows, plan, engine, talkgroup_facts)
+                failed.update(file_failed)
+                files_with_errors += bool(file_failed)
+                conn.execute("UPDATE tasks SET lease_expires = ? WHERE batch = ? AND status = 'leased'", (time.time() + lease_seconds, batch_id))
+
+            result = _encode_queue_result({'batches': {name: _encode_rows(rows) for name, rows in profile_rows.items()}, 'failed': failed,
+                                           'files_with_errors': files_with_errors, 'talkgroup_facts': talkgroup_facts, 'metrics': METRICS.drain()})
+            if _complete_batch(conn, batch_id, len(tasks), result):
+                print(f"[{worker_id}] Checked {len(tasks)} files")
+            else:
+                print(f"[{worker_id}] Lost the lease on batch {batch_id}; its files were handed back")
+    finally:
+        conn.close()
+
+def _merge_queue_results(queue_dir, profiles, talkgroup_facts=None):
+    """
+    Combines the results of every finished batch, and a "Could not check" row for every file
+    the queue gave up on or whose batch results are missing or unreadable, in queue order.
+    """
+    batches = {name: [] for name in profiles}
+    profile_errors = collections.Counter()
+
+    def could_not_check(path, reason):
+        filepath = os.path.join(queue_dir, path)
+        print(f"Error: Could not check '{filepath}': {reason}")
+        for name in profiles:
+            batches[name].append(_encode_rows([_could_not_check_row(filepath, reason)]))
+        profile_errors.update(profiles)
+        METRICS.count('files_with_errors')
+        if talkgroup_facts is not None:
+            talkgroup_facts[filepath] = None
+
+    conn = _open_queue(queue_dir)
+    try:
+        parts = conn.execute("SELECT MIN(seq), batch, NULL, NULL FROM tasks WHERE status = 'done' GROUP BY batch").fetchall()
+        parts += conn.execute("SELECT seq, NULL, path, attempts FROM tasks WHERE status = 'failed'").fetchall()
+        for _, batch_id, path, attempts in sorted(parts):
+            if batch_id is None:
+                could_not_check(path, f"worker died {attempts} times while checking it")
+                continue
+            row = conn.execute("SELECT result FROM results WHERE batch = ?", (batch_id,)).fetchone()
+            try:
+                if row is None:
+                    raise ValueError("missing")
+                result = _decode_queue_result(row[0])
+            except ValueError as e:
+                print(f"Warning: The results of queue batch {batch_id} are unreadable ({e}).")
+                for (batch_path,) in conn.execute("SELECT path FROM tasks WHERE batch = ? ORDER BY seq", (batch_id,)).fetchall():
+                    could_not_check(batch_path, "its results are missing from the queue")
+                continue
+            for name in profiles:
+                batches[name].append(result['batches'][name])
+            profile_errors.update(result['failed'])
+            METRICS.merge(result['metrics'])
+            METRICS.count('files_with_errors', result['files_with_errors'])
+            if talkgroup_facts is not None:
+                talkgroup_facts.update(result['talkgroup_facts'])
+    finally:
+        conn.close()
+    return {name: _decode_batches(name_batches) for name, name_batches in batches.items()}, profile_errors
+
+def run_queue_coordinator(queue_dir, xml_files, profiles, engine, local_workers=1, talkgroup_facts=None):
+    """
+    Queues xml_files, checks them with local_workers local worker processes plus any
+    workers started on other machines, then merges their batch results.
+    Returns ({profile name: report DataFrame}, Counter of files with errors per profile).
+    Raises RuntimeError if files are left but no worker is.
+    """
+    enqueue_files(queue_dir, xml_files, profiles, engine)
+    print(f"Queued {len(xml_files)} files in '{os.path.abspath(queue_dir)}'. Start more workers with: --queue-worker \"{os.path.abspath(queue_dir)}\"")
+
+    started = itertools.count(1)
+    def start_worker():
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-local{next(started)}"
+        process = multiprocessing.Process(target=run_queue_worker, args=(queue_dir, worker_id), daemon=True)
+        process.start()
+        return worker_id, process
+
+    workers = [start_worker() for _ in range(local_workers)]
+    progress = ProgressReporter(xml_files, interval=0, show_errors=False)
+    conn = _open_queue(queue_dir)
+    idle_polls = 0
+    try:
+        while True:
+            remaining = _queue_remaining(conn)
+            checked = len(xml_files) - remaining
+            if checked > progress.files: # the queue holds the findings; this only tracks throughput
+                progress.update(xml_files[progress.files:checked])
+            if remaining == 0:
+                break
+
+            for i, (worker_id, process) in enumerate(workers):
+                if process is None or process.is_alive():
+                    continue
+                # a local worker died: free its leases now rather than when they expire, and replace it
+                # only if it died holding files (those count against the file's attempts, so this ends)
+                released = conn.execute("UPDATE tasks SET lease_expires = 0 WHERE worker = ? AND status = 'leased'", (worker_id,)).rowcount
+                print(f"Warning: Queue worker {worker_id} exited (code {process.exitcode}).")
+                workers[i] = start_worker() if released else (worker_id, None)
+            _fail_exhausted_tasks(conn, time.time())
+
+            # remote workers are only visible through their leases; give them a poll to claim their next batch
+            leased = conn.execute("SELECT COUNT(*) FROM tasks WHERE status = 'leased' AND lease_expires >= ?", (time.time(),)).fetchone()[0]
+            idle_polls = 0 if leased or any(process is not None for _, process in workers) else idle_polls + 1
+            if idle_polls >= 2:
+                raise RuntimeError(f"no queue workers are left and {remaining} files are unchecked; "
+                                   f"start one with --queue-worker \"{os.path.abspath(queue_dir)}\" or rerun")
+            time.sleep(QUEUE_POLL_SECONDS)
+    finally:
+        conn.close()
+        for _, process in workers:
+            if process is not None:
+                process.join(timeout=QUEUE_POLL_SECONDS)
+    return _merge_queue_results(queue_dir, profiles, talkgroup_facts)
+
+####
+# Local query service
+####
+
+SERVE_FILE_LOCKS = 64 # a file is checked by one request at a time; files share these locks by hash
+
+class _CachedResult:
+    __slots__ = ('stamp', 'digest', 'rows', 'has_errors', 'size')
+
+    def __init__(self, stamp, digest, rows, has_errors):
+        self.stamp = stamp # (mtime_ns, size) when checked
+        self.digest = digest
+        self.rows = rows
+        self.has_errors = has_errors
+        self.size = sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in rows)
+
+class _ResultCache:
+    """
+    Memory-bounded LRU cache of per-file check results.
+    An entry is reused while the file's mtime/size is unchanged, or its content hash still matches.
+    Different files are checked concurrently; the same file is only checked once at a time.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.plan = _build_profile_plan([DEFAULT_PROFILE])
+        self.entries = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.file_locks = [threading.Lock() for _ in range(SERVE_FILE_LOCKS)]
+
+    def get(self, filepath):
+        """Returns (report rows, has_errors) for a file, checking it only if it changed."""
+        stat = os.stat(filepath)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self._lookup(filepath, stamp)
+        if entry:
+            return entry.rows, entry.has_errors
+
+        with self.file_locks[hash(filepath) % SERVE_FILE_LOCKS]:
+            with self.lock:
+                entry = self._lookup(filepath, stamp) # another request may have just checked it
+                stale = self.entries.get(filepath)
+            if entry:
+                return entry.rows, entry.has_errors
+
+            digest = _file_hash(filepath)
+            if stale is not None and stale.digest == digest: # touched but not changed
+                entry = stale
+                entry.stamp = stamp
+            else:
+                profile_rows = {DEFAULT_PROFILE: []}
+                failed = check_xml_file_profiles(filepath, profile_rows, self.plan)
+                entry = _CachedResult(stamp, digest, profile_rows[DEFAULT_PROFILE], DEFAULT_PROFILE in failed)
+                METRICS.count('files_checked')
+                METRICS.count('bytes_checked', stat.st_size)
+                METRICS.count('files_with_errors', entry.has_errors)
+
+            with self.lock:
+                self.misses += 1
+                self._store(filepath, entry)
+            METRICS.cache_lookup('serve', False)
+            return entry.rows, entry.has_errors
+
+    def _lookup(self, filepath, stamp):
+        entry = self.entries.get(filepath)
+        if entry is None or entry.stamp != stamp:
+            return None
+        self.entries.move_to_end(filepath)
+        self.hits += 1
+        METRICS.cache_lookup('serve', True)
+        return entry
+
+    def _store(self, filepath, entry):
+        old = self.entries.pop(filepath, None)
+        if old is not None:
+            self.total_bytes -= old.size
+        self.entries[filepath] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+def _rows_to_findings(rows):
+    return [dict(zip(XML_HEADER, row)) for row in rows if row[6] != "OK"]
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """
+    GET /serial/<serial>  compliance of one radio
+    GET /group/<name>     radios failing one check group
+    GET /summary          pass/fail for every radio in the folder
+    GET /stats            cache statistics
+    GET /metrics          run metrics in Prometheus text format
+    """
+
+    def do_GET(self):
+        parts = [unquote(part) for part in urlparse(self.path).path.strip('/').split('/', 1)]
+        try:
+            if parts[0] == 'serial' and len(parts) == 2:
+                self._send(200, self._serial(parts[1]))
+            elif parts[0] == 'group' and len(parts) == 2:
+                self._send(200, self._group(parts[1]))
+            elif parts[0] == 'summary':
+                self._send(200, self._summary())
+            elif parts[0] == 'stats':
+                self._send(200, self.server.cache.stats())
+            elif parts[0] == 'metrics':
+                self._send_text(200, METRICS.prometheus_text(), 'text/plain; version=0.0.4')
+            else:
+                self._send(404, {'error': 'Use /serial/<serial>, /group/<name>, /summary, /stats or /metrics'})
+        except FileNotFoundError:
+            self._send(404, {'error': f"No codeplug for '{parts[-1]}'"})
+
+    def _serial(self, serial):
+        filepath = os.path.join(self.server.folder, f"{os.path.basename(serial)}.xml")
+        rows, has_errors = self.server.cache.get(filepath)
+        return {'serial': serial, 'compliant': not has_errors, 'findings': _rows_to_findings(rows)}
+
+    def _group(self, group_name):
+        radios = []
+        for filepath in sorted(glob.glob(os.path.join(self.server.folder, '*.xml'))):
+            rows, _ = self.server.cache.get(filepath)
+            findings = [finding for finding in _rows_to_findings(rows) if finding['Reference'] == group_name]
+            if findings:
+                radios.append({'serial': os.path.basename(filepath).removesuffix('.xml'), 'findings': findings})
+        return {'group': group_name, 'failing': len(radios), 'radios': radios}
+
+    def _summary(self):
+        radios = {}
+        for filepath in sorted(glob.glob(os.path.join(self.server.folder, '*.xml'))):
+            _, has_errors = self.server.cache.get(filepath)
+            radios[os.path.basename(filepath).removesuffix('.xml')] = not has_errors
+        return {'files': len(radios), 'compliant': sum(radios.values()), 'radios': radios}
+
+    def _send(self, status, body):
+        self._send_text(status, json.dumps(body, default=str), 'application/json')
+
+    def _send_text(self, status, text, content_type):
+        payload = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+def serve(folder, port, cache_mb):
+    """Answers compliance queries for the codeplugs in `folder` on localhost only."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), _QueryHandler)
+    server.daemon_threads = True
+    server.folder = folder
+    server.cache = _ResultCache(cache_mb * 1024 * 1024)
+    print(f"Serving codeplug checks for '{os.path.abspath(folder)}' on http://127.0.0.1:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 # Adjust Excel column widths
+def _style_header(worksheet):
+    """Bold white text on blue, centered, for the header row of every report sheet."""
+    for cell in worksheet[1]:
+        cell.font = Font(bold=True, size=12, color=WHITE) # White font
+        cell.fill = PatternFill(start_color=BLUE, end_color=BLUE, fill_type="solid") # Blue fill
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+
 def adjust_column_width(worksheet):
     for col_cells in worksheet.columns:
         max_length = 0
@@ -907,7 +3168,7 @@ def color_fill_logic(cell, value_xml, value_td):
 ####
 # Generate Excel report
 ####
-def _generate_report(report_filename, df, files_with_errors, total_files):
+def _generate_report(report_filename, df, files_with_errors, total_files, open_report=True):
     with pd.ExcelWriter(report_filename, engine='openpyxl') as writer:
     
         sheet_name = f'{files_with_errors} of {total_files} files have errors'
@@ -919,11 +3180,7 @@ def _generate_report(report_filename, df, files_with_errors, total_files):
         green_fill = PatternFill(start_color=GREEN, end_color=GREEN, fill_type="solid") # Green fill
         red_fill = PatternFill(start_color=RED, end_color=RED, fill_type="solid") # Red fill
 
-        # Header
-        for cell in worksheet[1]:
-            cell.font = Font(bold=True, size=12, color=WHITE) # White font
-            cell.fill = PatternFill(start_color=BLUE, end_color=BLUE, fill_type="solid") # Blue fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+        _style_header(worksheet)
 
         # Loop through data rows
         header_length = len(df.columns.tolist())
@@ -990,17 +3247,553 @@ def _generate_report(report_filename, df, files_with_errors, total_files):
 
         adjust_column_width(worksheet)
 
+    if open_report:
+        _open_report(report_filename)
+
+def _open_report(report_filename):
     print(f"Opening Report: {report_filename}")
     try:
         os.startfile(report_filename) # open the report
     except AttributeError:
         print("Open report manually.")
 
+####
+# Sharded reports
+####
+
+EXCEL_MAX_ROWS = 1048576 # including the header row
+
+# --shard-by choice -> report column
+SHARD_COLUMNS = {
+    'model': 'Model',
+    'type': 'Type',
+    'group': 'Reference', # holds the check group name
+}
+
+_SHARD_LABEL_PATTERN = re.compile(r'[^\w.-]+') # characters not safe in a filename
+
+def _shard_report(df, shard_rows, shard_by=None):
+    """Splits the report into (label, rows) shards of at most shard_rows rows."""
+    if shard_by:
+        # files that could not be checked have no group
+        parts = [(str(key) or "Unchecked", part) for key, part in df.groupby(SHARD_COLUMNS[shard_by], sort=False, dropna=False, observed=True)]
+    else:
+        parts = [("", df)]
+
+    shards = []
+    for label, part in parts:
+        chunks = range(0, max(len(part), 1), shard_rows)
+        for n, start in enumerate(chunks):
+            if not label:
+                chunk_label = f"part{n+1:03d}"
+            else:
+                chunk_label = label if len(chunks) == 1 else f"{label}-{n+1}"
+            shards.append((chunk_label, part.iloc[start:start + shard_rows]))
+    return shards
+
+def _shard_error_count(df):
+    """(files in the shard, files with errors in the shard)"""
+    serials = df['Serial'].astype(str)
+    return serials.nunique(), serials[df['Problem'] != "OK"].nunique()
+
+def _write_report_shard(job):
+    shard_filename, df = job
+    total_files, files_with_errors = _shard_error_count(df)
+    _generate_report(shard_filename, df, files_with_errors, total_files, open_report=False)
+    return shard_filename
+
+def _generate_sharded_report(report_filename, df, files_with_errors, total_files, shard_rows=None, shard_by=None, workers=None):
+    """
+    Writes the report as shard workbooks in parallel worker processes,
+    plus an index workbook at report_filename that links to every shard.
+    """
+    shard_rows = min(shard_rows or EXCEL_MAX_ROWS - 1, EXCEL_MAX_ROWS - 1)
+    base_name = report_filename.removesuffix('.xlsx')
+    shards = _shard_report(df, shard_rows, shard_by)
+
+    jobs = [(f"{base_name}_{_SHARD_LABEL_PATTERN.sub('-', label)}.xlsx", part) for label, part in shards]
+
+    print(f"Writing {len(jobs)} report shards...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_write_report_shard, jobs))
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = f'{files_with_errors} of {total_files} files have errors'
+    worksheet.append(['Shard', 'Report', 'Rows', 'Files', 'Files with errors'])
+    for (label, part), (shard_filename, _) in zip(shards, jobs):
+        shard_files, shard_errors = _shard_error_count(part)
+        worksheet.append([label, os.path.basename(shard_filename), len(part), shard_files, shard_errors])
+        link_cell = worksheet.cell(row=worksheet.max_row, column=2)
+        link_cell.hyperlink = os.path.basename(shard_filename) # relative, so the set can be moved together
+        link_cell.font = Font(color=BLUE, underline='single')
+
+    _style_header(worksheet)
+    worksheet.freeze_panes = "A2"
+    adjust_column_width(worksheet)
+    workbook.save(report_filename)
+
+    _open_report(report_filename)
+
+####
+# Fleet-wide talkgroup index
+####
+
+TALKGROUP_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS radios (
+    serial TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS definitions (
+    ref_key TEXT NOT NULL,
+    serial TEXT NOT NULL REFERENCES radios(serial),
+    alias TEXT NOT NULL,
+    PRIMARY KEY (ref_key, serial)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS usages (
+    ref_key TEXT NOT NULL,
+    serial TEXT NOT NULL REFERENCES radios(serial),
+    context TEXT NOT NULL,
+    uses INTEGER NOT NULL,
+    PRIMARY KEY (ref_key, serial, context)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS definitions_serial ON definitions (serial);
+CREATE INDEX IF NOT EXISTS usages_serial ON usages (serial);
+"""
+
+def _open_talkgroup_index(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(TALKGROUP_INDEX_SCHEMA)
+    return conn
+
+def _delete_radio(conn, serial):
+    for table in ('definitions', 'usages', 'radios'):
+        conn.execute(f"DELETE FROM {table} WHERE serial = ?", (serial,))
+
+def update_talkgroup_index(conn, xml_files, talkgroup_facts):
+    """
+    Brings the index up to date with one pass's talkgroup facts ({filepath: (definitions, usages) or None}).
+    Only radios whose file changed since it was last indexed are rewritten; radios whose file
+    is gone from xml_files or could not be checked are dropped.
+    Returns (radios rewritten, radios dropped).
+    """
+    indexed = {serial: (mtime_ns, size) for serial, mtime_ns, size in conn.execute("SELECT serial, mtime_ns, size FROM radios")}
+    current = {os.path.basename(filepath).removesuffix('.xml') for filepath in xml_files}
+    indexed_at = datetime.now().isoformat(timespec='seconds')
+    rewritten = dropped = 0
+    with conn:
+        for filepath, facts in talkgroup_facts.items():
+            serial = os.path.basename(filepath).removesuffix('.xml')
+            if facts is None:
+                if serial in indexed:
+                    _delete_radio(conn, serial)
+                    dropped += 1
+                continue
+            stat = os.stat(filepath)
+            if indexed.get(serial) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            definitions, usages = facts
+            _delete_radio(conn, serial)
+            conn.execute("INSERT INTO radios (serial, mtime_ns, size, indexed_at) VALUES (?, ?, ?, ?)",
+                         (serial, stat.st_mtime_ns, stat.st_size, indexed_at))
+            conn.executemany("INSERT INTO definitions (ref_key, serial, alias) VALUES (?, ?, ?)",
+                             ((ref_key, serial, alias) for ref_key, alias in definitions.items()))
+            uses = collections.Counter(usage for usage in usages if usage[0])
+            conn.executemany("INSERT INTO usages (ref_key, serial, context, uses) VALUES (?, ?, ?, ?)",
+                             ((ref_key, serial, context, count) for (ref_key, context), count in uses.items()))
+            rewritten += 1
+        for serial in indexed.keys() - current:
+            _delete_radio(conn, serial)
+            dropped += 1
+    return rewritten, dropped
+
+def talkgroup_alias_conflicts(conn):
+    """Talkgroups whose Alias Text is not the same on every radio that defines them."""
+    return pd.read_sql_query("""
+        SELECT ref_key AS Talkgroup, alias AS "Alias Text", COUNT(*) AS Radios, GROUP_CONCAT(serial, ', ') AS Serials
+        FROM definitions
+        WHERE ref_key IN (SELECT ref_key FROM definitions GROUP BY ref_key HAVING COUNT(DISTINCT alias) > 1)
+        GROUP BY ref_key, alias
+        ORDER BY ref_key, COUNT(*) DESC, alias
+    """, conn)
+
+def talkgroup_usage_differences(conn):
+    """
+    Radios that use a talkgroup from a different set of contexts (channels, scan lists, ...)
+    than most radios using it.
+    """
+    usages = pd.read_sql_query("SELECT ref_key, serial, context FROM usages ORDER BY ref_key, serial, context", conn)
+    if usages.empty:
+        return pd.DataFrame(columns=['Talkgroup', 'Serial', 'Contexts', 'Usual Contexts', 'Radios With Usual'])
+    per_radio = usages.groupby(['ref_key', 'serial'], sort=False)['context'].agg('; '.join).reset_index()
+    counts = per_radio.groupby(['ref_key', 'context']).size().rename('radios').reset_index()
+    usual = counts.sort_values(['ref_key', 'radios', 'context'], ascending=[True, False, True]).drop_duplicates('ref_key')
+    merged = per_radio.merge(usual, on='ref_key', suffixes=('', '_usual'))
+    differing = merged[merged['context'] != merged['context_usual']]
+    return differing.rename(columns={'ref_key': 'Talkgroup', 'serial': 'Serial', 'context': 'Contexts',
+                                     'context_usual': 'Usual Contexts', 'radios': 'Radios With Usual'}).reset_index(drop=True)
+
+def talkgroup_lookup(conn, ref_key):
+    """Every radio that defines or uses one talkgroup, with its Alias Text and contexts."""
+    return pd.read_sql_query("""
+        SELECT r.serial AS Serial, d.alias AS "Alias Text",
+               (SELECT GROUP_CONCAT(context || ' (' || uses || ')', '; ') FROM usages u WHERE u.ref_key = :ref_key AND u.serial = r.serial) AS Contexts
+        FROM radios r LEFT JOIN definitions d ON d.serial = r.serial AND d.ref_key = :ref_key
+        WHERE d.ref_key IS NOT NULL OR EXISTS (SELECT 1 FROM usages u WHERE u.ref_key = :ref_key AND u.serial = r.serial)
+        ORDER BY r.serial
+    """, conn, params={'ref_key': ref_key})
+
+####
+# Findings history
+####
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    total_files INTEGER NOT NULL,
+    files_with_errors INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checked_files (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    serial TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'checked', -- or the Problem of the file's FILE_ERROR_PROBLEMS row
+    PRIMARY KEY (run_id, serial)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    serial TEXT NOT NULL,
+    system_context TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    setting TEXT NOT NULL,
+    problem TEXT NOT NULL,
+    expected TEXT NOT NULL,
+    actual TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS findings_run ON findings (run_id, serial);
+CREATE INDEX IF NOT EXISTS findings_setting ON findings (group_name, setting, serial);
+CREATE INDEX IF NOT EXISTS findings_serial ON findings (serial, group_name, setting);
+CREATE INDEX IF NOT EXISTS runs_profile ON runs (profile, started_at);
+"""
+
+# report column -> findings column
+HISTORY_COLUMNS = {
+    'Serial': 'serial',
+    'Setting': 'system_context',
+    'Reference': 'group_name',
+    'Group': 'setting',
+    'Problem': 'problem',
+    'Expected': 'expected',
+    'Actual': 'actual',
+}
+HISTORY_KEY = ['serial', 'system_context', 'group_name', 'setting', 'problem']
+
+def _open_history(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(HISTORY_SCHEMA)
+    if 'status' not in {row[1] for row in conn.execute("PRAGMA table_info(checked_files)")}:
+        # databases from before file-level failures were kept apart from findings
+        with conn:
+            conn.execute("ALTER TABLE checked_files ADD COLUMN status TEXT NOT NULL DEFAULT 'checked'")
+            conn.execute(f"DELETE FROM findings WHERE problem IN ({', '.join('?' * len(FILE_ERROR_PROBLEMS))})", FILE_ERROR_PROBLEMS)
+    return conn
+
+def _record_history(conn, df, profile, started_at, total_files, files_with_errors):
+    """
+    Appends one run's findings. Files that could not be checked are recorded in checked_files
+    with their Problem as the status, not as findings. Returns the new run_id.
+    """
+    findings = df[list(HISTORY_COLUMNS)].rename(columns=HISTORY_COLUMNS)
+    findings = findings.astype(object).fillna("").astype(str)
+    findings['serial'] = findings['serial'].str.removesuffix('.xml') # file-level rows carry the file name
+    file_errors = findings['problem'].isin(FILE_ERROR_PROBLEMS)
+    status = dict.fromkeys(findings['serial'], 'checked')
+    status.update(zip(findings.loc[file_errors, 'serial'], findings.loc[file_errors, 'problem']))
+    with conn:
+        run_id = conn.execute(
+            "INSERT INTO runs (started_at, profile, total_files, files_with_errors) VALUES (?, ?, ?, ?)",
+            (started_at, profile, total_files, files_with_errors),
+        ).lastrowid
+        conn.executemany("INSERT INTO checked_files (run_id, serial, status) VALUES (?, ?, ?)",
+                         ((run_id, serial, file_status) for serial, file_status in status.items()))
+        findings = findings[(findings['problem'] != "OK") & ~file_errors]
+        conn.executemany(
+            f"INSERT INTO findings (run_id, {', '.join(HISTORY_COLUMNS.values())}) VALUES (?, {', '.join('?' * len(HISTORY_COLUMNS))})",
+            ((run_id, *row) for row in findings.itertuples(index=False)),
+        )
+    return run_id
+
+def _history_delta(conn, run_id):
+    """
+    Findings added or resolved in run_id compared with the previous run of the same profile.
+    Only radios checked in both runs are compared, so a file that could not be checked
+    does not resolve its findings. Returns None for a profile's first run.
+    """
+    previous = conn.execute(
+        "SELECT MAX(p.run_id) FROM runs p JOIN runs r ON p.profile = r.profile WHERE r.run_id = ? AND p.run_id < ?",
+        (run_id, run_id),
+    ).fetchone()[0]
+    if previous is None:
+        return None
+
+    key = ", ".join(HISTORY_KEY)
+    query = f"""
+        SELECT ? AS change, f.* FROM findings f
+        WHERE f.run_id = ?
+          AND f.serial IN (SELECT serial FROM checked_files WHERE run_id = ? AND status = 'checked')
+          AND ({key}) NOT IN (SELECT {key} FROM findings WHERE run_id = ?)
+    """
+    added = pd.read_sql_query(query, conn, params=("Added", run_id, previous, previous))
+    resolved = pd.read_sql_query(query, conn, params=("Resolved", previous, run_id, run_id))
+    delta = pd.concat([added, resolved], ignore_index=True).drop(columns='run_id')
+    return delta.rename(columns={v: k for k, v in HISTORY_COLUMNS.items()}).rename(columns={'change': 'Change'})
+
+def _write_delta_report(report_filename, delta):
+    with pd.ExcelWriter(report_filename, engine='openpyxl') as writer:
+        sheet_name = f"{(delta['Change'] == 'Added').sum()} added, {(delta['Change'] == 'Resolved').sum()} resolved"
+        delta.to_excel(writer, sheet_name=sheet_name, index=False)
+        worksheet = writer.sheets[sheet_name]
+        _style_header(worksheet)
+        for cell in worksheet['A'][1:]:
+            color = RED if cell.value == "Added" else GREEN
+            cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+            cell.font = Font(color=WHITE)
+        worksheet.freeze_panes = "B2"
+        adjust_column_width(worksheet)
+    print(f"Delta report saved: {report_filename}")
+
+def history_regressions(conn, since, profile=DEFAULT_PROFILE):
+    """
+    Radios with findings in the latest run that they did not have in the last run on or before `since` (YYYY-MM-DD).
+    """
+    key = ", ".join(HISTORY_KEY)
+    return pd.read_sql_query(f"""
+        WITH latest AS (SELECT MAX(run_id) AS run_id FROM runs WHERE profile = :profile),
+             baseline AS (SELECT MAX(run_id) AS run_id FROM runs WHERE profile = :profile AND substr(started_at, 1, 10) <= :since),
+             new_findings AS (
+                SELECT {key} FROM findings WHERE run_id = (SELECT run_id FROM latest)
+                  AND serial IN (SELECT serial FROM checked_files WHERE run_id = (SELECT run_id FROM baseline) AND status = 'checked')
+                EXCEPT
+                SELECT {key} FROM findings WHERE run_id = (SELECT run_id FROM baseline)
+             )
+        SELECT serial AS Serial, COUNT(*) AS "New Findings", GROUP_CONCAT(group_name || ': ' || setting, '; ') AS Settings
+        FROM new_findings GROUP BY serial ORDER BY COUNT(*) DESC, serial
+    """, conn, params={'profile': profile, 'since': since})
+
+def history_first_seen(conn, profile=DEFAULT_PROFILE, group_name=None, setting=None):
+    """First and latest run in which each radio had a finding for a group/setting."""
+    filters = ["r.profile = :profile"]
+    if group_name:
+        filters.append("f.group_name = :group_name")
+    if setting:
+        filters.append("f.setting = :setting")
+    return pd.read_sql_query(f"""
+        SELECT f.serial AS Serial, f.group_name AS "Group Name", f.setting AS Setting,
+               MIN(r.started_at) AS "First Seen", MAX(r.started_at) AS "Last Seen", COUNT(DISTINCT r.run_id) AS Runs
+        FROM findings f JOIN runs r ON r.run_id = f.run_id
+        WHERE {" AND ".join(filters)}
+        GROUP BY f.serial, f.group_name, f.setting
+        ORDER BY "First Seen", f.serial
+    """, conn, params={'profile': profile, 'group_name': group_name, 'setting': setting})
+
+def _merge_td_data(df_report, df_td, use_api):
+    """Fills the TD-* columns of the report from the TD asset data."""
+    print("Merging data from TD.xlsx into report...")
+
+    td_col_names = {
+        'Serial': 'SerialNumber' if use_api else 'Serial Number',
+        'Dekalb': '(1F5) Dekalb',
+        'Fulton': '(5B2) Fulton',
+        'Atlanta': '(293) Atlanta',
+        'Cobb': '(17D) Cobb',
+        'Hall': '(1DE) Hall',
+        'Gwinnett': '(027A) Gwinnett',
+        'Alias': 'Radio User Alias'
+    }
+
+    # Create a list of columns we need from the TD data
+    cols_to_keep = [td_col_names['Serial']] + [v for k, v in td_col_names.items() if k != 'Serial' and v in df_td.columns]
+    df_td_filtered = df_td[cols_to_keep].copy()
+
+    # Rename columns for the final report
+    final_td_cols = {
+        td_col_names['Serial']: 'Serial', # This is the merge key
+        td_col_names['Dekalb']: 'TD-Dekalb',
+        td_col_names['Fulton']: 'TD-Fulton', # column 15
+        td_col_names['Atlanta']: 'TD-Atl', # column 17
+        td_col_names['Cobb']: 'TD-Cobb', # column 19
+        td_col_names['Hall']: 'TD-Hall', # column 21
+        td_col_names['Gwinnett']: 'TD-Gw', # column 23
+        td_col_names['Alias']: 'TD-Alias' # column 24
+    }
+    df_td_filtered.rename(columns=final_td_cols, inplace=True)
+    
+    # Merge keys are the same string type
+    df_report['Serial'] = df_report['Serial'].astype(str)
+    df_td_filtered['Serial'] = df_td_filtered['Serial'].astype(str)
+
+    df_report.set_index('Serial', inplace=True)
+    df_td_filtered.set_index('Serial', inplace=True)
+
+    df_report.update(df_td_filtered) # Update in place
+    df_report.reset_index(inplace=True)
+    return df_report
+
 ###########################
 ###### Main function ######
 ###########################
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Motorola Codeplug Checker")
+    parser.add_argument('--engine', choices=['tree', 'stream', 'vectorized'], default='tree',
+                        help="'tree' checks each file with XPath queries, 'stream' checks each file from parser events "
+                             "without building a tree, 'vectorized' checks the fleet as tables of a few hundred files each "
+                             "(same findings as 'tree', including Talkgroup Consistency)")
+    parser.add_argument('--snapshot-dir', metavar='DIR',
+                        help="cache flattened codeplugs in DIR by content hash so rule changes don't need a re-parse (vectorized engine)")
+    parser.add_argument('--profiles', nargs='+', choices=list(CHECK_PROFILES), default=[DEFAULT_PROFILE], metavar='PROFILE',
+                        help=f"rule profiles to check in one pass, one report each (choices: {', '.join(CHECK_PROFILES)})")
+    parser.add_argument('--shard-rows', type=int, metavar='N',
+                        help="split the report into workbooks of at most N rows (automatic past Excel's row limit)")
+    parser.add_argument('--shard-by', choices=list(SHARD_COLUMNS),
+                        help="split the report into one workbook per model, type or check group")
+    parser.add_argument('--report-workers', type=int, metavar='N',
+                        help="processes used to write report shards (default: one per CPU)")
+    parser.add_argument('--file-timeout', type=float, metavar='SECONDS',
+                        help="check each file in a worker process and give up on files that take longer")
+    parser.add_argument('--file-memory-mb', type=int, metavar='MB',
+                        help="check each file in a worker process limited to MB of memory (not on Windows)")
+    parser.add_argument('--history-db', metavar='PATH',
+                        help="append every run's findings to this SQLite database")
+    parser.add_argument('--delta-report', action='store_true',
+                        help="also write a report of findings added or resolved since the previous run (needs --history-db)")
+    parser.add_argument('--history-query', choices=['regressions', 'first-seen'],
+                        help="query --history-db instead of checking files")
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help="baseline date for --history-query regressions (default: 30 days ago)")
+    parser.add_argument('--group', help="check group to filter --history-query first-seen by")
+    parser.add_argument('--setting', help="setting to filter --history-query first-seen by")
+    parser.add_argument('--serve', type=int, nargs='?', const=8765, metavar='PORT',
+                        help="answer per-serial/per-group compliance queries over HTTP on localhost (default port 8765)")
+    parser.add_argument('--serve-cache-mb', type=int, default=256, metavar='MB',
+                        help="memory budget for cached results in --serve mode (default 256)")
+    parser.add_argument('--triage', action='store_true',
+                        help="only report pass/fail per file, stopping each file at its first failing check")
+    parser.add_argument('--triage-stats', default='Codeplug-Triage-Stats.json', metavar='PATH',
+                        help="where --triage keeps the failure rates and timings it orders checks by")
+    parser.add_argument('--audit', action='store_true',
+                        help="estimate per-group failure rates from a stratified random sample instead of checking every file")
+    parser.add_argument('--audit-precision', type=float, default=0.05, metavar='P',
+                        help="keep adding to the --audit sample until every confidence interval is within +/-P (default 0.05)")
+    parser.add_argument('--audit-confidence', type=float, default=0.95, metavar='C',
+                        help="confidence level of the --audit intervals (default 0.95)")
+    parser.add_argument('--audit-seed', type=int, metavar='N', help="random seed for a repeatable --audit sample")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="check files in N worker processes (tree or stream engine)")
+    parser.add_argument('--talkgroup-index', metavar='PATH',
+                        help="keep a SQLite index of every radio's talkgroup definitions and usages, updated on each run")
+    parser.add_argument('--talkgroup-query', choices=['aliases', 'usage', 'lookup'],
+                        help="query --talkgroup-index instead of checking files")
+    parser.add_argument('--talkgroup', metavar='REFERENCE_KEY', help="talkgroup for --talkgroup-query lookup")
+    parser.add_argument('--no-prevalidate', action='store_true',
+                        help="skip the quick well-formedness/structure pass that quarantines broken files before checking")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="write run metrics (files, per-phase latency histograms, cache hit rates, peak memory) in Prometheus text format")
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="write the same run metrics as JSON")
+    parser.add_argument('--memory-ceiling-mb', type=int, metavar='MB',
+                        help="check files in worker processes, running as many at once as fit under MB of memory "
+                             "(at most --workers, default: one per CPU)")
+    parser.add_argument('--coordinator', metavar='QUEUE_DIR',
+                        help="queue this folder's files in QUEUE_DIR (shared with other machines), check them with "
+                             "--workers local workers plus any --queue-worker, then build the report")
+    parser.add_argument('--queue-worker', metavar='QUEUE_DIR',
+                        help="check files from a coordinator's queue until it is empty")
+    parser.add_argument('--journal', metavar='PATH',
+                        help="record each checked file's findings in PATH as the run goes, so an interrupted tree/stream run can be resumed "
+                             "(hashes every file; PATH is a pickle, so only resume from a journal you wrote yourself)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted run: skip files --journal already has unchanged results for")
+    args = parser.parse_args()
+    if args.resume and not args.journal:
+        parser.error("--resume needs --journal PATH")
+    if args.journal and (args.engine == 'vectorized' or args.coordinator or args.triage or args.audit):
+        parser.error("--journal needs --engine tree or stream and cannot be combined with --coordinator, --triage or --audit")
+    if args.coordinator and (args.engine == 'vectorized' or args.file_timeout or args.file_memory_mb):
+        parser.error("--coordinator needs --engine tree or stream and cannot be combined with --file-timeout/--file-memory-mb")
+    if args.memory_ceiling_mb and (args.engine == 'vectorized' or args.file_timeout or args.file_memory_mb or args.coordinator):
+        parser.error("--memory-ceiling-mb needs --engine tree or stream and cannot be combined with --file-timeout/--file-memory-mb/--coordinator")
+    if args.memory_ceiling_mb and args.workers == 1:
+        args.workers = os.cpu_count() or 1
+    if args.workers > 1 and (args.engine == 'vectorized' or args.file_timeout or args.file_memory_mb):
+        parser.error("--workers needs --engine tree or stream and cannot be combined with --file-timeout/--file-memory-mb")
+    if not 0 < args.audit_precision < 1 or not 0 < args.audit_confidence < 1:
+        parser.error("--audit-precision and --audit-confidence must be between 0 and 1")
+    if args.talkgroup_query and not args.talkgroup_index:
+        parser.error("--talkgroup-query needs --talkgroup-index")
+    if args.talkgroup_query == 'lookup' and not args.talkgroup:
+        parser.error("--talkgroup-query lookup needs --talkgroup")
+    if args.talkgroup_index and not args.talkgroup_query and (args.engine == 'vectorized' or not any(CHECK_PROFILES[name]['talkgroups'] for name in args.profiles)):
+        parser.error("--talkgroup-index needs --engine tree or stream and a profile that checks talkgroups")
+    if (args.delta_report or args.history_query) and not args.history_db:
+        parser.error("--delta-report and --history-query require --history-db")
+    if (args.file_timeout or args.file_memory_mb) and args.engine == 'vectorized':
+        parser.error("--file-timeout and --file-memory-mb require --engine tree or stream")
+    if args.shard_rows is not None and args.shard_rows < 1:
+        parser.error("--shard-rows must be at least 1")
+    if args.snapshot_dir and args.engine != 'vectorized':
+        parser.error("--snapshot-dir requires --engine vectorized")
+    if args.profiles != [DEFAULT_PROFILE] and args.engine == 'vectorized':
+        parser.error("--profiles other than the default requires --engine tree or stream")
+    return args
+
+def _run_history_query(args):
+    conn = _open_history(args.history_db)
+    try:
+        profile = args.profiles[0]
+        if args.history_query == 'regressions':
+            since = args.since or (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+            print(f"Radios with new findings since {since} ({profile}):")
+            result = history_regressions(conn, since, profile)
+        else:
+            print(f"First time each setting went wrong ({profile}):")
+            result = history_first_seen(conn, profile, args.group, args.setting)
+        print(result.to_string(index=False) if not result.empty else "Nothing found.")
+    finally:
+        conn.close()
+
+def _run_talkgroup_query(args):
+    conn = _open_talkgroup_index(args.talkgroup_index)
+    try:
+        if args.talkgroup_query == 'aliases':
+            print("Talkgroups with different Alias Text across radios:")
+            result = talkgroup_alias_conflicts(conn)
+        elif args.talkgroup_query == 'usage':
+            print("Radios using a talkgroup from different contexts than most radios:")
+            result = talkgroup_usage_differences(conn)
+        else:
+            print(f"Radios with talkgroup '{args.talkgroup}':")
+            result = talkgroup_lookup(conn, args.talkgroup)
+        print(result.to_string(index=False) if not result.empty else "Nothing found.")
+    finally:
+        conn.close()
+
 def main():
+    args = _parse_args()
+    if args.history_query:
+        _run_history_query(args)
+        return
+    if args.talkgroup_query:
+        _run_talkgroup_query(args)
+        return
+    if args.serve:
+        serve('.', args.serve, args.serve_cache_mb)
+        return
+    if args.queue_worker:
+        run_queue_worker(args.queue_worker)
+        return
 
     print("Motorola Codeplug Checker")
     print("by Morgan King, Gwinnett County")
@@ -1053,73 +3846,123 @@ def main():
         return
 
     total_files = len(xml_files)
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-    report_filename = f'Codeplug-Report_{timestamp}.xlsx'
-    report_rows = []
-    files_with_errors = 0
-
-    # input each row
-    for i, filepath in enumerate(xml_files):
-        print(f"Processing file {i+1} of {total_files}: {os.path.basename(filepath)}")
-        if check_xml_file(filepath, report_rows):
-            files_with_errors += 1
-
-    xml_header = ['Serial', 'XML-Alias', 'XML-Gw', 'Setting','Reference', 'Group','Problem', 'Expected', 'Actual', 'Model', 'Type', 'Dekalb', 'TD-Dekalb', 'Fulton', 'TD-Fulton', 'Atlanta', 'TD-Atl', 'Cobb', 'TD-Cobb', 'Hall', 'TD-Hall', 'TD-Gw', 'TD-Alias']
-    df_report = pd.DataFrame(report_rows, columns=xml_header)
-
-    # add data from TD.xlsx to report
-    # rows_with_td = []
-    if df_td is not None:
-        print("Merging data from TD.xlsx into report...")
-
-        td_col_names = {
-            'Serial': 'SerialNumber' if use_api else 'Serial Number',
-            'Dekalb': '(1F5) Dekalb',
-            'Fulton': '(5B2) Fulton',
-            'Atlanta': '(293) Atlanta',
-            'Cobb': '(17D) Cobb',
-            'Hall': '(1DE) Hall',
-            'Gwinnett': '(027A) Gwinnett',
-            'Alias': 'Radio User Alias'
-        }
-
-        # Create a list of columns we need from the TD data
-        cols_to_keep = [td_col_names['Serial']] + [v for k, v in td_col_names.items() if k != 'Serial' and v in df_td.columns]
-        df_td_filtered = df_td[cols_to_keep].copy()
-
-        # Rename columns for the final report
-        final_td_cols = {
-            td_col_names['Serial']: 'Serial', # This is the merge key
-            td_col_names['Dekalb']: 'TD-Dekalb',
-            td_col_names['Fulton']: 'TD-Fulton', # column 15
-            td_col_names['Atlanta']: 'TD-Atl', # column 17
-            td_col_names['Cobb']: 'TD-Cobb', # column 19
-            td_col_names['Hall']: 'TD-Hall', # column 21
-            td_col_names['Gwinnett']: 'TD-Gw', # column 23
-            td_col_names['Alias']: 'TD-Alias' # column 24
-        }
-        df_td_filtered.rename(columns=final_td_cols, inplace=True)
-        
-        # Merge keys are the same string type
-        df_report['Serial'] = df_report['Serial'].astype(str)
-        df_td_filtered['Serial'] = df_td_filtered['Serial'].astype(str)
+    started_at = datetime.now().isoformat(timespec='seconds')
 
-        df_report.set_index('Serial', inplace=True)
-        df_td_filtered.set_index('Serial', inplace=True)
+    if args.audit: # checks only a sample, so broken files count against the estimate instead of being pre-validated
+        estimates, strata = run_audit(xml_files, args.audit_precision, args.audit_confidence, args.audit_seed, args.workers)
+        print(estimates.to_string(index=False, formatters={column: "{:.1%}".format for column in ('Estimated Rate', 'Low', 'High')}))
+        _write_audit_report(f'Codeplug-Audit_{datetime.now().strftime("%Y-%m-%d_%H-%M")}.xlsx', estimates, strata, args.audit_confidence)
+        write_metrics(args.metrics_prom, args.metrics_json)
+        return
 
-        df_report.update(df_td_filtered) # Update in place
-        df_report.reset_index(inplace=True) 
+    quarantine = {}
+    if not args.no_prevalidate:
+        xml_files, quarantine = prevalidate_files(xml_files, args.workers if args.workers > 1 else os.cpu_count() or 1)
+        for filepath, reason in quarantine.items():
+            print(f"Quarantined '{filepath}': {reason}")
+
+    if args.triage:
+        triage = run_triage(xml_files, args.triage_stats)
+        quarantined = pd.DataFrame([(os.path.basename(filepath).removesuffix('.xml'), "FAIL", f"Quarantined: {reason}")
+                                    for filepath, reason in quarantine.items()], columns=triage.columns)
+        triage = pd.concat([triage, quarantined], ignore_index=True) if quarantine else triage
+        triage_filename = f'Codeplug-Triage_{datetime.now().strftime("%Y-%m-%d_%H-%M")}.csv'
+        triage.to_csv(triage_filename, index=False)
+        print(f"{(triage['Result'] == 'FAIL').sum()} of {total_files} files fail. Triage list saved: {triage_filename}")
+        write_metrics(args.metrics_prom, args.metrics_json)
+        return
+    report_rows = []
 
-        final_df = df_report # Use the merged DataFrame
+    # input each row
+    if args.engine == 'vectorized':
+        files_with_errors = check_fleet_vectorized(xml_files, report_rows, args.snapshot_dir)
+        profile_results = {None: (report_rows, files_with_errors)}
     else:
-        final_df = df_report # No merge, use original report
+        # every profile is checked in the same pass over each file
+        plan = _build_profile_plan(args.profiles)
+        talkgroup_facts = {} if args.talkgroup_index else None
+        journal = None
+        pending = xml_files
+        if args.journal:
+            try:
+                journal = RunJournal(args.journal, args.profiles, talkgroup_facts is not None, args.resume)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+            pending = journal.pending(xml_files)
+        try:
+            if args.coordinator:
+                try:
+                    profile_rows, profile_errors = run_queue_coordinator(args.coordinator, xml_files, args.profiles, args.engine, args.workers, talkgroup_facts)
+                except RuntimeError as e:
+                    print(f"Error: {e}")
+                    return
+            elif args.memory_ceiling_mb:
+                profile_rows, profile_errors = check_files_adaptive(pending, plan, args.engine, args.workers, args.memory_ceiling_mb, talkgroup_facts, journal)
+            elif args.workers > 1:
+                profile_rows, profile_errors = check_files_parallel(pending, plan, args.engine, args.workers, talkgroup_facts, journal)
+            else:
+                profile_rows, profile_errors = check_files(pending, plan, args.engine, args.file_timeout, args.file_memory_mb, talkgroup_facts, journal)
+            if journal: # the report covers resumed files too, so it is built from the journal
+                del profile_rows
+                profile_rows, profile_errors, talkgroup_facts = journal.results(xml_files)
+        finally:
+            if journal:
+                journal.close()
+        if args.talkgroup_index:
+            conn = _open_talkgroup_index(args.talkgroup_index)
+            try:
+                rewritten, dropped = update_talkgroup_index(conn, xml_files, talkgroup_facts)
+            finally:
+                conn.close()
+            print(f"Talkgroup index updated: {rewritten} radios rewritten, {dropped} dropped.")
+        if args.profiles == [DEFAULT_PROFILE]:
+            profile_results = {None: (profile_rows[DEFAULT_PROFILE], profile_errors[DEFAULT_PROFILE])}
+        else:
+            profile_results = {name: (profile_rows[name], profile_errors[name]) for name in args.profiles}
+
+    if quarantine: # quarantined files go straight into every report
+        quarantine_rows = pd.DataFrame([_quarantine_row(filepath, reason) for filepath, reason in quarantine.items()], columns=XML_HEADER)
+        for profile, (rows, files_with_errors) in profile_results.items():
+            rows = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=XML_HEADER)
+            profile_results[profile] = (pd.concat([rows.astype(object), quarantine_rows], ignore_index=True), files_with_errors + len(quarantine))
+        METRICS.count('files_with_errors', len(quarantine))
 
-    # --- STEP 4: Generate the Final Report ---
+    # --- STEP 4: Generate the Final Report(s) ---
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-    report_filename = f'Codeplug-Report_{timestamp}.xlsx'
-    
-    # Pass the final, merged DataFrame to be styled and saved
-    _generate_report(report_filename, final_df, files_with_errors, total_files)
+    history = _open_history(args.history_db) if args.history_db else None
+    for profile, (rows, files_with_errors) in profile_results.items():
+        df_report = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=XML_HEADER)
+
+        if history:
+            history_started = time.perf_counter()
+            run_id = _record_history(history, df_report, profile or DEFAULT_PROFILE, started_at, total_files, files_with_errors)
+            if args.delta_report:
+                delta = _history_delta(history, run_id)
+                if delta is None:
+                    print("No previous run to compare with; skipping delta report.")
+                else:
+                    profile_part = f"{profile}_" if profile else ""
+                    _write_delta_report(f'Codeplug-Delta_{profile_part}{timestamp}.xlsx', delta)
+            METRICS.observe('history', time.perf_counter() - history_started)
+
+        # add data from TD.xlsx to report
+        with METRICS.timed('td_merge'):
+            final_df = _merge_td_data(df_report, df_td, use_api) if df_td is not None else df_report
+
+        report_filename = f'Codeplug-Report_{profile}_{timestamp}.xlsx' if profile else f'Codeplug-Report_{timestamp}.xlsx'
+
+        # Pass the final, merged DataFrame to be styled and saved
+        with METRICS.timed('report'):
+            if args.shard_rows or args.shard_by or len(final_df) >= EXCEL_MAX_ROWS:
+                _generate_sharded_report(report_filename, final_df, files_with_errors, total_files, args.shard_rows, args.shard_by, args.report_workers)
+            else:
+                _generate_report(report_filename, final_df, files_with_errors, total_files)
+
+    if history:
+        history.close()
+    write_metrics(args.metrics_prom, args.metrics_json)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # worker processes in the pyinstaller .exe
     main()
\ No newline at end of file
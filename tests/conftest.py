@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import check
+
+ALIAS_FIELD = 'User Information\\Radio Alias'
+SYSTEMS = [('GWINNETT P25', 12345), ('Dekalb', 222), ('FULTON', 333)]
+CHANNEL_IDS = {
+    'Channel ID 3': [('Identifier Enable', 'True'), ('Base Frequency (MHz)', '851.012500'), ('Channel Spacing (kHz)', '12.500'),
+                     ('Channel Type', 'TDMA'), ('Transmit Offset (MHz)', '45.000000'), ('Transmit Offset Sign', '-')],
+    'Channel ID 4': [('Identifier Enable', 'True'), ('Base Frequency (MHz)', '762.006250'), ('Channel Spacing (kHz)', '12.500'),
+                     ('Channel Type', 'TDMA'), ('Transmit Offset (MHz)', '30.000000'), ('Transmit Offset Sign', '+')],
+}
+
+# serials covering Portable and Mobile models; every third radio is compliant
+FLEET_SERIALS = ['4260000000', '4810000001', '5270000002', '5790000003', '6520000004', '7560000005']
+
+
+def _field(name, value):
+    return f'<Field Name="{name}">{value}</Field>'
+
+
+def _embedded(name, ref_key, fields, section="S"):
+    return f'<EmbeddedNode Name="{name}" ReferenceKey="{ref_key}"><Section Name="{section}">' + ''.join(_field(k, v) for k, v in fields) + '</Section></EmbeddedNode>'
+
+
+def make_codeplug(good=True, alias="UNIT 1"):
+    """A small codeplug export with one element for every rule in CHECKS_TO_PERFORM."""
+    parts = ['<?xml version="1.0"?><Codeplug>',
+             f'<Recset Name="Radio Wide"><Node Name="Radio Wide" ReferenceKey="RW"><Section Name="General">{_field(ALIAS_FIELD, alias)}</Section></Node></Recset>',
+             '<Recset Name="Trunking System">']
+    for system, unit_id in SYSTEMS:
+        parts.append(f'<Node Name="Trunking System" ReferenceKey="{system}"><Section Name="General">{_field("Unit ID", unit_id)}</Section>')
+        parts.append(f'<Section Name="ASTRO 25">{_field("Phase 2 Voice Capable", "True" if good else "False")}</Section><Section Name="Channel IDs">')
+        for ref_key, fields in CHANNEL_IDS.items():
+            if good or ref_key == 'Channel ID 3':
+                parts.append(_embedded("Channel ID", ref_key, fields))
+        parts.append('</Section></Node>')
+    parts.append('</Recset>')
+
+    parts.append('<Recset Name="Conventional Personality"><Node Name="Conventional Personality" ReferenceKey="800 ANALOG"><Section Name="Personalities">')
+    for group in check.CHECKS_TO_PERFORM:
+        if group['group_name'].endswith('Personality'):
+            fields = {name: (value[0] if isinstance(value, list) else value) for name, value in group['fields'].items()}
+            if not good:
+                fields.pop('Tx PL Code', None)
+                fields['Tx PL Freq'] = '100.0'
+            parts.append(_embedded("Personality", group['group_name'].split()[0], fields.items()))
+    parts.append('</Section></Node></Recset>')
+
+    parts.append('<Recset Name="Zone Channel Assignment"><Node Name="Zone Channel Assignment" ReferenceKey="Z1 INTEROP"><Section Name="Channels">')
+    for group in check.CHECKS_TO_PERFORM:
+        if group['group_name'].startswith('INTEROP'):
+            ref_key = group['base_xpath'].split("EmbeddedNode[@ReferenceKey='")[1].split("'")[0]
+            fields = {name: (value[0] if isinstance(value, list) else value) for name, value in group['fields'].items()}
+            if not good:
+                fields['Active Channel'] = 'False'
+                fields['Top Display Channel'] = 'BLANK'
+            parts.append(_embedded("Channel", ref_key, list(fields.items()) + [('ASTRO Talkgroup ID', 'IO 1')]))
+    parts.append('</Section></Node></Recset>')
+
+    parts.append('<Recset Name="ASTRO Talkgroup List"><Node Name="ASTRO Talkgroup List" ReferenceKey="TGL"><Section Name="T">'
+                 + _embedded("Talkgroup Table", "IO 1", [('Talkgroup Alias Text', 'IO 1' if good else 'IO ONE')], "TG")
+                 + '</Section></Node></Recset></Codeplug>')
+    return ''.join(parts)
+
+
+def write_fleet(folder, serials=FLEET_SERIALS):
+    """Writes one codeplug per serial into folder and returns their paths in folder order."""
+    paths = []
+    for i, serial in enumerate(serials):
+        path = os.path.join(folder, f"{serial}.xml")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(make_codeplug(good=(i % 3 == 0), alias=f"UNIT {i}"))
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def fleet(tmp_path, monkeypatch):
+    """A folder of fixture codeplugs as the working directory; returns their relative paths."""
+    write_fleet(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return sorted(f"{serial}.xml" for serial in FLEET_SERIALS)
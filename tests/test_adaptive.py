@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+
+import pytest
+
+import check
+from conftest import FLEET_SERIALS, write_fleet
+
+# the worker processes must inherit the monkeypatched module
+needs_fork = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork start method")
+
+MB = 1024 * 1024
+
+
+@needs_fork
+def test_concurrency_backs_off_under_memory_pressure_and_recovers(tmp_path, monkeypatch):
+    serials = [serial[:3] + f"{i:07d}" for i, serial in enumerate(FLEET_SERIALS * 4)]
+    files = write_fleet(tmp_path, serials)
+    coordinator = os.getpid()
+    reading = {'rss': 10 * MB}
+    # workers report a small, steady footprint; only the coordinator's reading changes
+    monkeypatch.setattr(check, '_current_rss', lambda: reading['rss'] if os.getpid() == coordinator else 1 * MB)
+
+    in_flight = []
+    real_wait = check.wait
+
+    def wait(running, **kwargs):
+        in_flight.append(len(running))
+        finished = real_wait(running, **kwargs)
+        reading['rss'] = 500 * MB if 3 <= len(in_flight) < 9 else 10 * MB # pressure for a few completions, then relief
+        return finished
+
+    monkeypatch.setattr(check, 'wait', wait)
+    plan = check._build_profile_plan(['Gwinnett'])
+    rows, errors = check.check_files_adaptive(files, plan, 'tree', 3, memory_ceiling_mb=100)
+
+    assert in_flight[0] == 3
+    assert min(in_flight[3:9]) == 1 # no new file starts until the running ones drain
+    assert max(in_flight[9:]) == 3 # ...and it goes back up once memory is released
+    expected, expected_errors = check.check_files(files, plan, 'tree')
+    assert rows == expected and errors == expected_errors
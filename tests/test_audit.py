@@ -0,0 +1,73 @@
+import random
+from statistics import NormalDist
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import check
+
+Z95 = NormalDist().inv_cdf(0.975)
+
+
+def test_allocation_is_proportional():
+    assert check._proportional_allocation({'a': 50, 'b': 30, 'c': 20}, 10) == {'a': 5, 'b': 3, 'c': 2}
+    assert check._proportional_allocation({'a': 98, 'b': 1, 'c': 1}, 3) == {'a': 1, 'b': 1, 'c': 1}
+
+
+def test_allocation_sums_to_the_sample_with_one_per_stratum():
+    rng = random.Random(7)
+    for _ in range(500):
+        sizes = {f"s{i}": rng.choice([1, 2, 3, rng.randint(1, 5000)]) for i in range(rng.randint(1, 12))}
+        population = sum(sizes.values())
+        total = rng.randint(len(sizes), population)
+        allocation = check._proportional_allocation(sizes, total)
+        assert sum(allocation.values()) == total
+        assert all(1 <= allocation[name] <= sizes[name] for name in sizes)
+
+
+def _population(size, failing, prefix):
+    return [(f"{prefix}{i:04d}", i < failing) for i in range(size)]
+
+
+def test_stratified_rate_on_a_known_population():
+    strata = {'A': (100, [f"A{i}" for i in range(10)]), 'B': (300, [f"B{i}" for i in range(30)])}
+    failures = {f"A{i}": {"G"} if i < 2 else set() for i in range(10)} | {f"B{i}": {"G"} if i < 15 else set() for i in range(30)}
+    estimate, low, high = check._stratified_rate(strata, failures, bool, Z95)
+    assert estimate == pytest.approx(0.25 * 0.2 + 0.75 * 0.5)
+    assert 0.2 < low < estimate < high < 0.65
+
+    census = {'A': (10, [f"A{i}" for i in range(10)]), 'B': (30, [f"B{i}" for i in range(30)])}
+    assert check._stratified_rate(census, failures, bool, Z95) == pytest.approx((17 / 40,) * 3)
+
+
+def test_stratified_interval_covers_the_true_rate():
+    population = {'A': _population(400, 40, "A"), 'B': _population(1600, 800, "B")}
+    true_rate = 840 / 2000
+    rng = random.Random(11)
+    covered = 0
+    trials = 400
+    for _ in range(trials):
+        strata, failures = {}, {}
+        for name, radios in population.items():
+            sample = rng.sample(radios, 40 if name == 'A' else 160)
+            strata[name] = (len(radios), [serial for serial, _ in sample])
+            failures.update({serial: {"G"} if failing else set() for serial, failing in sample})
+        _, low, high = check._stratified_rate(strata, failures, bool, Z95)
+        covered += low <= true_rate <= high
+    assert 0.90 <= covered / trials <= 0.99
+
+
+def test_report_headers_share_one_style(tmp_path):
+    estimates = pd.DataFrame([("G", 2, 1, 0.5, 0.1, 0.9, 5)], columns=['Group', 'Sampled', 'Failing In Sample', 'Estimated Rate', 'Low', 'High', 'Estimated Radios'])
+    strata = pd.DataFrame([("426 (4000 Portable)", 10, 2)], columns=['Stratum', 'Radios', 'Sampled'])
+    check._write_audit_report(str(tmp_path / "audit.xlsx"), estimates, strata, 0.95)
+    delta = pd.DataFrame([("Added", "4810000001", "G")], columns=['Change', 'Serial', 'Group'])
+    check._write_delta_report(str(tmp_path / "delta.xlsx"), delta)
+
+    for name in ("audit.xlsx", "delta.xlsx"):
+        for worksheet in openpyxl.load_workbook(tmp_path / name).worksheets:
+            for cell in worksheet[1]:
+                assert cell.font.bold and cell.font.color.rgb == check.WHITE
+                assert cell.fill.start_color.rgb == check.BLUE
+                assert cell.alignment.horizontal == 'center'
@@ -0,0 +1,178 @@
+import pickle
+import threading
+
+import pandas as pd
+import pytest
+
+import check
+
+
+def _rows(rows):
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=check.XML_HEADER)
+    return frame.astype(object).astype(str).values.tolist()
+
+
+def _without_talkgroups(monkeypatch):
+    monkeypatch.setitem(check.CHECK_PROFILES, 'No Talkgroups', {'checks': check.CHECKS_TO_PERFORM, 'talkgroups': False})
+    return check._build_profile_plan(['No Talkgroups'])
+
+
+def test_vectorized_matches_tree(fleet):
+    tree_rows, tree_errors = check.check_files(fleet, check._build_profile_plan(['Gwinnett']), 'tree')
+    vectorized_rows = []
+    vectorized_errors = check.check_fleet_vectorized(fleet, vectorized_rows)
+
+    assert _rows(vectorized_rows) == _rows(tree_rows['Gwinnett'])
+    assert vectorized_errors == tree_errors['Gwinnett'] == 4
+    assert any(row[6] == "Section Missing" for row in vectorized_rows)
+    assert any(row[4] == "Talkgroup Consistency" for row in vectorized_rows)
+
+
+def test_vectorized_without_talkgroups_matches_tree_in_chunks(fleet, monkeypatch):
+    monkeypatch.setattr(check, 'VECTORIZED_CHUNK_FILES', 4)
+    plan = _without_talkgroups(monkeypatch)
+    tree_rows, tree_errors = check.check_files(fleet, plan, 'tree')
+    vectorized_rows = []
+    vectorized_errors = check.check_fleet_vectorized(fleet, vectorized_rows, talkgroups=False)
+
+    assert _rows(vectorized_rows) == _rows(tree_rows['No Talkgroups'])
+    assert vectorized_errors == tree_errors['No Talkgroups'] == 4
+
+
+def test_vectorized_flattens_only_what_the_rules_use(fleet):
+    recsets, fields = check._vectorized_columns_needed(check.CHECKS_TO_PERFORM)
+    metadata, columns, _ = check._read_codeplug_table(fleet[1], recsets=recsets, fields=fields)
+    _, everything, _ = check._read_codeplug_table(fleet[1])
+
+    assert set(columns['recset']) == recsets
+    assert 'Radio Wide' in everything['recset'] and 'Radio Wide' not in recsets # the alias comes from the metadata instead
+    assert set(columns['field']) - {None} <= fields
+    assert 'Talkgroup Alias Text' in everything['field'] and 'Talkgroup Alias Text' not in columns['field']
+    assert columns == check._prune_flat_columns(everything, recsets, fields)
+
+
+def test_stream_matches_tree(fleet):
+    plan = check._build_profile_plan(['Gwinnett', 'Interop'])
+    tree_rows, tree_errors = check.check_files(fleet, plan, 'tree')
+    stream_rows, stream_errors = check.check_files(fleet, plan, 'stream')
+
+    for name in tree_rows:
+        assert _rows(stream_rows[name]) == _rows(tree_rows[name])
+    assert stream_errors == tree_errors
+
+
+def test_mobile_radios_skip_top_display_channel(fleet):
+    rows, _ = check.check_files(fleet, check._build_profile_plan(['Gwinnett']), 'tree')
+    settings = {(row[10], row[5]) for row in rows['Gwinnett']}
+    assert ('Portable', 'Top Display Channel') in settings
+    assert ('Mobile', 'Top Display Channel') not in settings
+
+
+NESTED_CODEPLUG = (
+    '<?xml version="1.0"?><Codeplug>'
+    '<Recset Name="Radio Wide"><Node Name="Radio Wide" ReferenceKey="RW"><Section Name="General">'
+    '<Field Name="User Information\\Radio Alias">UNIT 9</Field></Section></Node></Recset>'
+    '<Recset Name="Zone Channel Assignment"><Node Name="Zone Channel Assignment" ReferenceKey="Z1 INTEROP"><Section Name="Channels">'
+    '<EmbeddedNode Name="Channel" ReferenceKey="Outer"><Section Name="C"><Field Name="A">1</Field>'
+    '<EmbeddedNode Name="Channel" ReferenceKey="Inner"><Section Name="C"><Field Name="B">2</Field></Section></EmbeddedNode>'
+    '</Section></EmbeddedNode>'
+    '<Section Name="Sub"><Field Name="D">4</Field></Section>'
+    '</Section></Node></Recset></Codeplug>'
+)
+
+NESTED_RULES = [
+    {'group_name': 'Outer', 'base_xpath': ".//Recset[@Name='Zone Channel Assignment']//EmbeddedNode[@ReferenceKey='Outer']",
+     'fields': {'A': '1', 'B': '3', 'D': '4'}},
+    {'group_name': 'Channels', 'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[ci:contains(@ReferenceKey, 'interop')]/Section[@Name='Channels']",
+     'context_node_name': 'Zone Channel Assignment',
+     'fields': {'A': '1', 'B': '2', 'D': '5'}},
+    {'group_name': 'Zone', 'base_xpath': ".//Recset[@Name='Zone Channel Assignment']/Node[ci:contains(@ReferenceKey, 'interop')]",
+     'fields': {'B': '2', 'E': '5'}},
+]
+
+
+def test_engines_find_fields_in_nested_elements(tmp_path, monkeypatch):
+    (tmp_path / "4810000001.xml").write_text(NESTED_CODEPLUG, encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(check.CHECK_PROFILES, 'Nested', {'checks': NESTED_RULES, 'talkgroups': False})
+    plan = check._build_profile_plan(['Nested'])
+    files = ["4810000001.xml"]
+
+    tree_rows, _ = check.check_files(files, plan, 'tree')
+    stream_rows, _ = check.check_files(files, plan, 'stream')
+    vectorized_rows = []
+    check.check_fleet_vectorized(files, vectorized_rows, checks=NESTED_RULES, talkgroups=False)
+
+    findings = [(row[4], row[5], row[6], row[8]) for row in tree_rows['Nested']]
+    assert findings == [
+        ('Outer', 'B', "Incorrect Value", '2'),
+        ('Outer', 'D', "Setting Missing", "N/A"),
+        ('Channels', 'D', "Incorrect Value", '4'),
+        ('Zone', 'E', "Setting Missing", "N/A"),
+    ]
+    assert _rows(stream_rows['Nested']) == _rows(tree_rows['Nested'])
+    assert _rows(vectorized_rows) == _rows(tree_rows['Nested'])
+
+
+def test_vectorized_rejects_whole_recset_rules():
+    with pytest.raises(ValueError):
+        check._compile_selector({'group_name': 'Whole Recset', 'base_xpath': ".//Recset[@Name='Radio Wide']", 'fields': {}})
+
+
+def test_stream_folds_unit_id_keys_like_tree(fleet, monkeypatch):
+    monkeypatch.setitem(check.UNIT_ID_SYSTEMS, 'dekalb_id', 'DEKALß') # casefolds to 'dekalss', lower() does not
+    with open(fleet[0], encoding='utf-8') as f:
+        xml = f.read().replace('ReferenceKey="Dekalb"', 'ReferenceKey="Dekalss"')
+    with open(fleet[0], 'w', encoding='utf-8') as f:
+        f.write(xml)
+    plan = check._build_profile_plan(['Gwinnett'])
+    tree_rows, _ = check.check_files(fleet[:1], plan, 'tree')
+    stream_rows, _ = check.check_files(fleet[:1], plan, 'stream')
+
+    assert {row[11] for row in tree_rows['Gwinnett']} == {222}
+    assert _rows(stream_rows['Gwinnett']) == _rows(tree_rows['Gwinnett'])
+
+
+def test_compiled_xpaths_are_per_thread():
+    expression = ".//Field[@Name='A']"
+    mine = check._compiled_xpath(expression)
+    theirs = []
+    thread = threading.Thread(target=lambda: theirs.append(check._compiled_xpath(expression)))
+    thread.start()
+    thread.join()
+    assert check._compiled_xpath(expression) is mine
+    assert theirs[0] is not mine
+
+
+def test_plans_are_compiled_once_per_model_and_type(fleet, monkeypatch):
+    monkeypatch.setattr(check, '_MODEL_PLANS', {})
+    monkeypatch.setattr(check, '_STREAM_RULES', {})
+    plan = check._build_profile_plan(['Gwinnett'])
+    radios = {check._get_model_and_mobile_from_serial(filepath[:10]) for filepath in fleet}
+    for _ in range(5):
+        plan = pickle.loads(pickle.dumps(plan)) # as each worker task receives it
+        for engine in ('tree', 'stream'):
+            check.check_files(fleet, plan, engine)
+
+    assert {key[1:] for key in check._MODEL_PLANS} == radios
+    assert len(check._MODEL_PLANS) == len(check._STREAM_RULES) == len(radios)
+
+
+MODEL_RULES = [
+    {'group_name': 'Model 6000', 'models': [6000], 'base_xpath': ".//Recset[@Name='Radio Wide']/Node[ci:equals(@ReferenceKey, 'RW')]/Section[@Name='General']",
+     'fields': {'Only On 6000': 'True'}},
+    {'group_name': 'Mobiles', 'types': ['Mobile'], 'base_xpath': ".//Recset[@Name='Radio Wide']/Node[ci:equals(@ReferenceKey, 'RW')]/Section[@Name='General']",
+     'fields': {'Only On Mobiles': 'True'}},
+]
+
+
+def test_groups_apply_only_to_their_models_and_types(fleet, monkeypatch):
+    monkeypatch.setitem(check.CHECK_PROFILES, 'By Model', {'checks': MODEL_RULES, 'talkgroups': False})
+    plan = check._build_profile_plan(['By Model'])
+    radios = {filepath[:10]: check._get_model_and_mobile_from_serial(filepath[:10]) for filepath in fleet}
+
+    for engine in ('tree', 'stream'):
+        rows, _ = check.check_files(fleet, plan, engine)
+        found = {(row[0], row[4]) for row in rows['By Model'] if row[6] == "Setting Missing"}
+        assert found == ({(serial, 'Model 6000') for serial, (model, _) in radios.items() if model == 6000}
+                         | {(serial, 'Mobiles') for serial, (_, mobile_hh) in radios.items() if mobile_hh == 'Mobile'})
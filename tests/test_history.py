@@ -0,0 +1,83 @@
+import sqlite3
+
+import check
+
+METADATA = {'alias': "UNIT", **{key: None for key in check.UNIT_ID_SYSTEMS}}
+
+
+def _finding(serial, group_name, setting, actual="False"):
+    return check._finding_row(serial, METADATA, "N/A", group_name, setting, "Incorrect Value", "True", actual, 6000, 'Portable')
+
+
+def _ok(serial):
+    return check._success_row(serial, METADATA, 6000, 'Portable')
+
+
+def _record(conn, started_at, rows):
+    df = check.pd.DataFrame(rows, columns=check.XML_HEADER)
+    return check._record_history(conn, df, 'Gwinnett', started_at, df['Serial'].nunique(), 0)
+
+
+def _history(tmp_path):
+    """Two runs: A gains a finding, B could not be parsed the second time, C is fixed."""
+    conn = check._open_history(str(tmp_path / "history.sqlite"))
+    first = _record(conn, "2026-01-01T08:00:00", [
+        _finding('A', 'Phase 2', 'Voice'), _finding('B', 'Phase 2', 'Voice'), _finding('C', 'INTEROP', 'Active Channel'), _ok('D'),
+    ])
+    second = _record(conn, "2026-02-01T08:00:00", [
+        _finding('A', 'Phase 2', 'Voice'), _finding('A', 'INTEROP', 'Active Channel'),
+        check._parse_error_row("B.xml"), _ok('C'), check._could_not_check_row("D.xml", "timed out after 5 s"),
+    ])
+    return conn, first, second
+
+
+def test_file_level_failures_are_a_status_not_findings(tmp_path):
+    conn, _, second = _history(tmp_path)
+    assert conn.execute("SELECT serial, status FROM checked_files WHERE run_id = ? ORDER BY serial", (second,)).fetchall() == [
+        ('A', 'checked'), ('B', "Could not parse XML"), ('C', 'checked'), ('D', "Could not check")]
+    assert conn.execute("SELECT COUNT(*) FROM findings WHERE group_name = '' OR problem IN ('Could not parse XML', 'Could not check')").fetchone() == (0,)
+
+
+def test_delta_compares_radios_checked_in_both_runs(tmp_path):
+    conn, first, second = _history(tmp_path)
+    assert check._history_delta(conn, first) is None
+    delta = check._history_delta(conn, second)
+    assert sorted(delta[['Change', 'Serial', 'Reference', 'Group']].values.tolist()) == [
+        ["Added", 'A', 'INTEROP', 'Active Channel'],
+        ["Resolved", 'C', 'INTEROP', 'Active Channel'], # B's finding is not resolved by a file that would not parse
+    ]
+
+
+def test_regressions_since_a_date(tmp_path):
+    conn, _, _ = _history(tmp_path)
+    regressions = check.history_regressions(conn, "2026-01-15")
+    assert regressions.values.tolist() == [['A', 1, "INTEROP: Active Channel"]]
+    assert check.history_regressions(conn, "2026-02-01").empty # the latest run is its own baseline
+
+
+def test_first_seen(tmp_path):
+    conn, _, _ = _history(tmp_path)
+    seen = check.history_first_seen(conn)
+    assert seen[['Serial', 'Group Name', 'Setting', 'First Seen', 'Last Seen', 'Runs']].values.tolist() == [
+        ['A', 'Phase 2', 'Voice', "2026-01-01T08:00:00", "2026-02-01T08:00:00", 2],
+        ['B', 'Phase 2', 'Voice', "2026-01-01T08:00:00", "2026-01-01T08:00:00", 1],
+        ['C', 'INTEROP', 'Active Channel', "2026-01-01T08:00:00", "2026-01-01T08:00:00", 1],
+        ['A', 'INTEROP', 'Active Channel', "2026-02-01T08:00:00", "2026-02-01T08:00:00", 1],
+    ]
+    assert check.history_first_seen(conn, group_name='INTEROP', setting='Active Channel')['Serial'].tolist() == ['C', 'A']
+
+
+def test_old_history_databases_are_upgraded(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    old = sqlite3.connect(path)
+    old.executescript(check.HISTORY_SCHEMA.replace(
+        "    status TEXT NOT NULL DEFAULT 'checked', -- or the Problem of the file's FILE_ERROR_PROBLEMS row\n", ""))
+    old.execute("INSERT INTO runs VALUES (1, '2026-01-01', 'Gwinnett', 1, 1)")
+    old.execute("INSERT INTO checked_files VALUES (1, 'bad.xml')")
+    old.execute("INSERT INTO findings VALUES (1, 'bad.xml', 'Setting', 'Ref', 'Group', 'Could not parse XML', 'Expect', 'Actual')")
+    old.commit()
+    old.close()
+
+    conn = check._open_history(path)
+    assert conn.execute("SELECT status FROM checked_files").fetchall() == [('checked',)]
+    assert conn.execute("SELECT COUNT(*) FROM findings").fetchone() == (0,)
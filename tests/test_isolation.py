@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+import check
+
+# the worker processes must inherit the monkeypatched module
+needs_fork = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork start method")
+
+HANG = "HANG 6000 HH.xml"
+CRASH = "CRASH 6000 HH.xml"
+
+
+@pytest.fixture
+def misbehaving(fleet, monkeypatch):
+    """The fleet plus a file that hangs its worker and one that kills it."""
+    check_file = check.check_xml_file_profiles
+
+    def misbehave(filepath, *args, **kwargs):
+        if os.path.basename(filepath) == HANG:
+            time.sleep(60)
+        if os.path.basename(filepath) == CRASH:
+            os._exit(7)
+        return check_file(filepath, *args, **kwargs)
+
+    monkeypatch.setattr(check, 'check_xml_file_profiles', misbehave)
+    shutil.copy(fleet[0], HANG)
+    shutil.copy(fleet[0], CRASH)
+    return [fleet[0], HANG, fleet[1], CRASH] + fleet[2:]
+
+
+@needs_fork
+def test_hung_and_crashed_files_are_reported_and_the_run_goes_on(fleet, misbehaving):
+    plan = check._build_profile_plan(['Gwinnett'])
+    expected, expected_errors = check.check_files(fleet, plan, 'tree')
+    rows, errors = check.check_files(misbehaving, plan, 'tree', file_timeout=1)
+
+    report = pd.DataFrame(rows['Gwinnett'], columns=check.XML_HEADER)
+    problems = report[report['Serial'].isin([HANG, CRASH])][['Serial', 'Problem', 'Actual', 'Reference', 'Model']].values.tolist()
+    assert problems == [[HANG, "Could not check", "timed out after 1 s", "", 6000],
+                        [CRASH, "Could not check", "worker crashed (exit code 7)", "", 6000]]
+    assert [row for row in rows['Gwinnett'] if row[0] not in (HANG, CRASH)] == expected['Gwinnett']
+    assert errors['Gwinnett'] == expected_errors['Gwinnett'] + 2
+
+
+@needs_fork
+def test_dead_worker_is_replaced(fleet, misbehaving):
+    plan = check._build_profile_plan(['Gwinnett'])
+    checker = check._IsolatedChecker(plan, 'tree', timeout=10)
+    rows = {'Gwinnett': []}
+    try:
+        assert checker.check(fleet[0], rows) == set()
+        first = checker.process.pid
+        assert checker.check(CRASH, rows) == {'Gwinnett'}
+        assert checker.process is None
+        assert checker.check(fleet[0], rows) == set()
+        assert checker.process.pid != first
+    finally:
+        checker.close()
+    assert [row[6] for row in rows['Gwinnett']] == ["OK", "Could not check", "OK"]
@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+import pytest
+
+import check
+
+PROFILES = ['Gwinnett', 'Interop']
+
+
+def _frame(rows):
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=check.XML_HEADER)
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).astype(str).reset_index(drop=True) # journal rows come back categorical
+
+
+def _assert_same_reports(rows, expected):
+    assert set(rows) == set(expected)
+    for name in expected:
+        assert _frame(rows[name]).equals(_frame(expected[name]))
+
+
+@pytest.fixture
+def plan():
+    return check._build_profile_plan(PROFILES)
+
+
+def test_interrupted_run_resumes_from_journal(fleet, plan, tmp_path):
+    expected_facts = {}
+    expected, expected_errors = check.check_files(fleet, plan, 'tree', talkgroup_facts=expected_facts)
+    path = str(tmp_path / "run.journal")
+    journal = check.RunJournal(path, PROFILES, True)
+    check.check_files(fleet[:5], plan, 'stream', talkgroup_facts={}, journal=journal)
+    journal.close()
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 10) # the run died while writing the fifth entry
+
+    journal = check.RunJournal(path, PROFILES, True, resume=True)
+    pending = journal.pending(fleet)
+    assert pending == fleet[4:]
+    check.check_files(pending, plan, 'tree', talkgroup_facts={}, journal=journal)
+    rows, errors, facts = journal.results(fleet)
+    journal.close()
+
+    _assert_same_reports(rows, expected)
+    assert errors == expected_errors
+    assert facts == expected_facts
+
+
+def test_changed_file_is_checked_again(fleet, plan, tmp_path):
+    path = str(tmp_path / "run.journal")
+    journal = check.RunJournal(path, PROFILES, False)
+    check.check_files(fleet, plan, 'tree', journal=journal)
+    journal.close()
+    with open(fleet[2], 'a', encoding='utf-8') as f:
+        f.write("\n")
+
+    journal = check.RunJournal(path, PROFILES, False, resume=True)
+    assert journal.pending(fleet) == [fleet[2]]
+    journal.close()
+
+
+def test_journal_from_other_profiles_is_refused(fleet, plan, tmp_path):
+    path = str(tmp_path / "run.journal")
+    journal = check.RunJournal(path, PROFILES, False)
+    check.check_files(fleet[:1], plan, 'tree', journal=journal)
+    journal.close()
+    with pytest.raises(ValueError, match="different --profiles"):
+        check.RunJournal(path, ['Gwinnett'], False, resume=True)
+
+
+def test_resume_needs_journal(fleet, monkeypatch, tmp_path):
+    monkeypatch.setattr('sys.argv', ['check.py', '--resume'])
+    with pytest.raises(SystemExit):
+        check.main()
+    assert set(tmp_path.iterdir()) == set(tmp_path.glob("*.xml")) # nothing written
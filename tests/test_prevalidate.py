@@ -0,0 +1,50 @@
+import pytest
+
+import check
+from conftest import make_codeplug
+
+GOOD = make_codeplug()
+
+
+@pytest.mark.parametrize("content, reason", [
+    ("", "Empty file"),
+    (" \n\t\n", "Empty export (no XML elements)"),
+    (GOOD[:len(GOOD) // 2], "Truncated export (ends inside <"),
+    (GOOD.replace('</Recset><Recset Name="Trunking System">', '</Recsett><Recset Name="Trunking System">', 1), "Malformed XML: "),
+    ('<?xml version="1.0"?><Inventory><Recset Name="Radio Wide"/></Inventory>', "Not a codeplug export (root element <Inventory>)"),
+    ('<?xml version="1.0"?><Codeplug/>', "Not a codeplug export (no Recset elements)"),
+    (GOOD.replace('Recset Name="Radio Wide"', 'Recset Name="Radio Wide Old"', 1), "Missing Recset 'Radio Wide'"),
+])
+def test_bad_files_are_quarantined_with_their_reason(tmp_path, content, reason):
+    path = tmp_path / "4810000001.xml"
+    path.write_text(content, encoding='utf-8')
+    assert check._prevalidate_file(str(path)).startswith(reason)
+
+
+def test_good_files_pass(fleet):
+    assert check.prevalidate_files(fleet) == (fleet, {})
+
+
+class _SpyPool(check.ProcessPoolExecutor):
+    started = 0
+
+    def __init__(self, *args, **kwargs):
+        _SpyPool.started += 1
+        super().__init__(*args, **kwargs)
+
+
+def test_only_large_folders_are_prevalidated_in_parallel(fleet, monkeypatch):
+    with open("4810000009.xml", 'w', encoding='utf-8') as f:
+        f.write("")
+    files = fleet + ["4810000009.xml"]
+    monkeypatch.setattr(check, 'ProcessPoolExecutor', _SpyPool)
+    monkeypatch.setattr(check, 'PREVALIDATE_PARALLEL_FILES', len(files) + 1)
+
+    serial = check.prevalidate_files(files, workers=2)
+    assert _SpyPool.started == 0
+    assert serial == (fleet, {"4810000009.xml": "Empty file"})
+
+    monkeypatch.setattr(check, 'PREVALIDATE_PARALLEL_FILES', len(files))
+    assert check.prevalidate_files(files, workers=1) == serial and _SpyPool.started == 0 # one worker never starts a pool
+    assert check.prevalidate_files(files, workers=2) == serial
+    assert _SpyPool.started == 1
@@ -0,0 +1,127 @@
+import json
+import multiprocessing
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import check
+
+# the worker processes must inherit the monkeypatched module
+needs_fork = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork start method")
+
+
+def _frame(rows):
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=check.XML_HEADER)
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).astype(str).reset_index(drop=True) # merged categoricals hold NaN for blanks
+
+
+@pytest.fixture
+def fast_queue(monkeypatch):
+    monkeypatch.setattr(check, 'QUEUE_POLL_SECONDS', 0.05)
+
+
+def test_expired_lease_is_picked_up_by_another_worker(fleet, tmp_path):
+    plan = check._build_profile_plan(['Gwinnett'])
+    expected, expected_errors = check.check_files(fleet, plan, 'tree')
+    queue_dir = str(tmp_path / "queue")
+    check.enqueue_files(queue_dir, fleet, ['Gwinnett'], 'tree')
+    conn = check._open_queue(queue_dir)
+    check._claim_batch(conn, 'dead', 4, -1) # a worker that claimed a batch and died
+
+    check.run_queue_worker(queue_dir, 'alive', batch_size=3)
+    rows, errors = check._merge_queue_results(queue_dir, ['Gwinnett'])
+
+    assert _frame(rows['Gwinnett']).equals(_frame(expected['Gwinnett']))
+    assert errors == expected_errors
+    assert conn.execute("SELECT COUNT(*) FROM tasks WHERE worker = 'dead'").fetchone()[0] == 0
+    conn.close()
+
+
+@needs_fork
+def test_coordinator_matches_sequential_run(fleet, tmp_path, fast_queue):
+    plan = check._build_profile_plan(['Gwinnett'])
+    expected, expected_errors = check.check_files(fleet, plan, 'tree')
+    rows, errors = check.run_queue_coordinator(str(tmp_path / "queue"), fleet, ['Gwinnett'], 'tree', local_workers=2)
+    assert _frame(rows['Gwinnett']).equals(_frame(expected['Gwinnett']))
+    assert errors == expected_errors
+
+
+@needs_fork
+def test_file_that_kills_its_worker_is_given_up(fleet, tmp_path, monkeypatch, fast_queue):
+    poison = "POISON 6000 HH.xml"
+    shutil.copy(fleet[0], poison)
+    files = fleet[:3] + [poison] + fleet[3:]
+    check_file = check.check_xml_file_profiles
+
+    def crash_on_poison(filepath, *args, **kwargs):
+        if os.path.basename(filepath) == poison:
+            os._exit(1)
+        return check_file(filepath, *args, **kwargs)
+
+    monkeypatch.setattr(check, 'check_xml_file_profiles', crash_on_poison)
+    queue_dir = str(tmp_path / "queue")
+    rows, errors = check.run_queue_coordinator(queue_dir, files, ['Gwinnett'], 'tree', local_workers=1)
+
+    report = _frame(rows['Gwinnett'])
+    poisoned = report[report['Serial'] == poison]
+    assert poisoned[['Problem', 'Actual']].values.tolist() == [["Could not check", f"worker died {check.QUEUE_MAX_ATTEMPTS} times while checking it"]]
+    expected, expected_errors = check.check_files(fleet, check._build_profile_plan(['Gwinnett']), 'tree')
+    assert report[report['Serial'] != poison].reset_index(drop=True).equals(_frame(expected['Gwinnett']))
+    assert errors['Gwinnett'] == expected_errors['Gwinnett'] + 1
+    conn = check._open_queue(queue_dir)
+    assert conn.execute("SELECT status, attempts FROM tasks WHERE path LIKE ?", (f"%{poison}",)).fetchone() == ('failed', check.QUEUE_MAX_ATTEMPTS)
+    conn.close()
+
+
+@needs_fork
+def test_coordinator_stops_when_no_workers_are_left(fleet, tmp_path, monkeypatch, fast_queue):
+    monkeypatch.setattr(check, 'run_queue_worker', lambda *args: os._exit(3))
+    with pytest.raises(RuntimeError, match="no queue workers are left"):
+        check.run_queue_coordinator(str(tmp_path / "queue"), fleet, ['Gwinnett'], 'tree', local_workers=2)
+
+
+def test_queue_paths_on_another_drive_are_absolute(tmp_path, monkeypatch):
+    def no_relative_path(path, start):
+        raise ValueError("path is on mount 'D:', start on mount 'C:'")
+
+    monkeypatch.setattr(check.os.path, 'relpath', no_relative_path)
+    filepath = str(tmp_path / "4810000001.xml")
+    assert check._queue_path(str(tmp_path / "queue"), filepath) == filepath
+
+
+def test_batch_results_are_stored_as_plain_data(fleet, tmp_path):
+    plan = check._build_profile_plan(['Gwinnett'])
+    expected_facts = {}
+    check.check_files(fleet, plan, 'tree', talkgroup_facts=expected_facts)
+    queue_dir = str(tmp_path / "queue")
+    check.enqueue_files(queue_dir, fleet, ['Gwinnett'], 'tree')
+    check.run_queue_worker(queue_dir, 'alive', batch_size=4)
+
+    conn = check._open_queue(queue_dir)
+    results = [json.loads(text) for (text,) in conn.execute("SELECT result FROM results")]
+    conn.close()
+    assert len(results) == 2
+    assert os.listdir(queue_dir) == [check.QUEUE_DB] # nothing a crafted file could be slipped in as
+    facts = {}
+    check._merge_queue_results(queue_dir, ['Gwinnett'], facts)
+    assert {os.path.basename(filepath): value for filepath, value in facts.items()} == expected_facts
+
+
+def test_missing_batch_results_are_reported_not_raised(fleet, tmp_path):
+    queue_dir = str(tmp_path / "queue")
+    check.enqueue_files(queue_dir, fleet, ['Gwinnett'], 'tree')
+    check.run_queue_worker(queue_dir, 'alive', batch_size=4)
+    conn = check._open_queue(queue_dir)
+    lost = conn.execute("SELECT batch FROM tasks WHERE seq = 1").fetchone()[0]
+    conn.execute("DELETE FROM results WHERE batch = ?", (lost,))
+    conn.execute("UPDATE results SET result = 'not json'")
+    conn.close()
+
+    rows, errors = check._merge_queue_results(queue_dir, ['Gwinnett'])
+    report = _frame(rows['Gwinnett'])
+    assert report['Serial'].tolist() == fleet
+    assert set(report['Actual']) == {"its results are missing from the queue"}
+    assert errors['Gwinnett'] == len(fleet)
@@ -0,0 +1,37 @@
+import pandas as pd
+
+import check
+
+
+def test_shard_by_group_skips_unused_categories(fleet):
+    plan = check._build_profile_plan(['Gwinnett'])
+    rows, _ = check.check_files_parallel(fleet, plan, 'tree', 2) # categorical columns, like a parallel run
+    df = rows['Gwinnett']
+    df['Reference'] = df['Reference'].cat.add_categories(["Never Used"])
+
+    shards = check._shard_report(df, 10, 'group')
+
+    assert all(len(part) for _, part in shards)
+    assert "Never Used" not in {label for label, _ in shards}
+    assert sum(len(part) for _, part in shards) == len(df)
+    assert all(len(part) <= 10 for _, part in shards)
+
+
+def test_shard_rows_without_grouping():
+    df = pd.DataFrame({'Serial': range(25)})
+    shards = check._shard_report(df, 10)
+    assert [label for label, _ in shards] == ["part001", "part002", "part003"]
+    assert [len(part) for _, part in shards] == [10, 10, 5]
+
+
+def test_files_that_could_not_be_checked_have_no_placeholder_cells(fleet):
+    with open("4810000009.xml", 'w', encoding='utf-8') as f:
+        f.write("<Codeplug><Recset")
+    rows, _ = check.check_files(fleet + ["4810000009.xml"], check._build_profile_plan(['Gwinnett']), 'tree')
+    df = pd.DataFrame(rows['Gwinnett'], columns=check.XML_HEADER)
+
+    error_row = df[df['Problem'] == "Could not parse XML"].iloc[0]
+    assert error_row[['Serial', 'Model', 'Type']].tolist() == ["4810000009.xml", 6000, 'Portable']
+    assert set(error_row.drop(['Serial', 'Problem', 'Model', 'Type'])) == {""}
+    labels = [label for label, _ in check._shard_report(df, 1000, 'group')]
+    assert "Unchecked" in labels and "Ref" not in labels
@@ -0,0 +1,102 @@
+import json
+import os
+import re
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import check
+
+
+def test_result_cache_reuses_and_invalidates(fleet):
+    cache = check._ResultCache(64 * 1024 * 1024)
+    rows, has_errors = cache.get(fleet[1])
+    assert has_errors and rows
+    assert cache.get(fleet[1]) == (rows, has_errors)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    with open(fleet[0], encoding='utf-8') as f:
+        compliant = f.read()
+    with open(fleet[1], 'w', encoding='utf-8') as f:
+        f.write(compliant)
+    os.utime(fleet[1], ns=(1, 1))
+    _, has_errors = cache.get(fleet[1])
+    assert not has_errors
+    assert cache.misses == 2
+
+
+def test_result_cache_locks_stay_bounded(fleet):
+    cache = check._ResultCache(1) # evicts all but the newest entry
+    for _ in range(3):
+        for filepath in fleet:
+            cache.get(filepath)
+    assert len(cache.file_locks) == check.SERVE_FILE_LOCKS
+    assert len(cache.entries) == 1
+
+
+def test_result_cache_checks_a_file_once_under_concurrency(fleet, monkeypatch):
+    calls = []
+    check_file = check.check_xml_file_profiles
+    monkeypatch.setattr(check, 'check_xml_file_profiles', lambda *args, **kwargs: calls.append(args[0]) or check_file(*args, **kwargs))
+    cache = check._ResultCache(64 * 1024 * 1024)
+    threads = [threading.Thread(target=cache.get, args=(fleet[2],)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [fleet[2]]
+
+
+def _get(server, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}") as response:
+        return response.read().decode('utf-8')
+
+
+def test_metrics_count_files_checked_by_the_service(fleet, tmp_path, monkeypatch):
+    monkeypatch.setattr(check, 'METRICS', check.RunMetrics())
+    server = ThreadingHTTPServer(('127.0.0.1', 0), check._QueryHandler)
+    server.folder = str(tmp_path)
+    server.cache = check._ResultCache(64 * 1024 * 1024)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        summary = json.loads(_get(server, "/summary"))
+        _get(server, "/summary") # answered from the cache
+        metrics = _get(server, "/metrics").splitlines()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert summary['files'] == len(fleet) and summary['compliant'] == 2
+    assert f"codeplug_files_checked_total {len(fleet)}" in metrics
+    assert "codeplug_files_with_errors_total 4" in metrics
+    assert f"codeplug_bytes_checked_total {sum(os.path.getsize(filepath) for filepath in fleet)}" in metrics
+    assert f'codeplug_cache_requests_total{{cache="serve",result="hit"}} {len(fleet)}' in metrics
+    assert f'codeplug_cache_requests_total{{cache="serve",result="miss"}} {len(fleet)}' in metrics
+
+
+def test_prometheus_text_format():
+    metrics = check.RunMetrics()
+    metrics.count('files_checked', 3)
+    metrics.observe('parse', 0.02)
+    metrics.observe('parse', 100.0)
+    metrics.cache_lookup('snapshot', True)
+    metrics.cache_lookup('snapshot', False)
+    lines = metrics.prometheus_text().splitlines()
+
+    for name in check.METRIC_COUNTERS:
+        assert lines.index(f"# TYPE codeplug_{name}_total counter") == lines.index(f"# HELP codeplug_{name}_total {check.METRIC_COUNTERS[name]}") + 1
+    assert "codeplug_files_checked_total 3" in lines
+    assert "codeplug_files_resumed_total 0" in lines
+    assert "# TYPE codeplug_phase_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith('codeplug_phase_seconds_bucket{phase="parse"')]
+    assert len(buckets) == len(check.LATENCY_BUCKETS) + 1
+    assert 'codeplug_phase_seconds_bucket{phase="parse",le="0.01"} 0' in buckets
+    assert 'codeplug_phase_seconds_bucket{phase="parse",le="0.025"} 1' in buckets # cumulative
+    assert 'codeplug_phase_seconds_bucket{phase="parse",le="30.0"} 1' in buckets
+    assert 'codeplug_phase_seconds_bucket{phase="parse",le="+Inf"} 2' in buckets
+    assert 'codeplug_phase_seconds_sum{phase="parse"} 100.02' in lines
+    assert 'codeplug_phase_seconds_count{phase="parse"} 2' in lines
+    assert 'codeplug_cache_hit_ratio{cache="snapshot"} 0.5' in lines
+    sample = re.compile(r'^codeplug_[a-z_]+(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? -?[0-9.e+]+$')
+    assert all(line.startswith("# ") or sample.match(line) for line in lines)
@@ -0,0 +1,55 @@
+import os
+
+import check
+from conftest import make_codeplug
+
+
+def _vectorized_rows(fleet, snapshot_dir=None):
+    rows = []
+    errors = check.check_fleet_vectorized(fleet, rows, snapshot_dir)
+    return [[str(value) for value in row] for row in rows], errors
+
+
+def _snapshot_lookups():
+    hits, misses = check.METRICS.drain()['caches'].get('snapshot', [0, 0])
+    return hits, misses
+
+
+def test_snapshots_give_the_same_findings_as_parsing(fleet, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    expected = _vectorized_rows(fleet)
+    check.METRICS.drain()
+
+    assert _vectorized_rows(fleet, snapshot_dir) == expected
+    assert _snapshot_lookups() == (0, len(fleet))
+    assert _vectorized_rows(fleet, snapshot_dir) == expected
+    assert _snapshot_lookups() == (len(fleet), 0)
+
+
+def test_editing_a_file_replaces_its_snapshot(fleet, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    _vectorized_rows(fleet, snapshot_dir)
+    with open(fleet[0], 'w', encoding='utf-8') as f: # the first radio was compliant
+        f.write(make_codeplug(good=False, alias="UNIT 0"))
+    check.METRICS.drain()
+
+    rows, errors = _vectorized_rows(fleet, snapshot_dir)
+    assert _snapshot_lookups() == (len(fleet) - 1, 1)
+    assert (rows, errors) == _vectorized_rows(fleet)
+    assert any(row[0] == fleet[0][:10] and row[6] == "Incorrect Value" for row in rows)
+    assert len(os.listdir(snapshot_dir)) == len(fleet) + 1
+
+
+def test_corrupt_snapshots_are_cache_misses(fleet, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    expected = _vectorized_rows(fleet, snapshot_dir)
+    for i, name in enumerate(sorted(os.listdir(snapshot_dir))):
+        with open(os.path.join(snapshot_dir, name), 'wb') as f:
+            # a torn write, garbage, and a frame that claims to be huge
+            f.write([b'\x80\x05\x95\x10', b'not a pickle', b'\x80\x05\x95\xff\xff\xff\xff\xff\xff\x00\x00'][i % 3])
+    check.METRICS.drain()
+
+    assert _vectorized_rows(fleet, snapshot_dir) == expected
+    assert _snapshot_lookups() == (0, len(fleet))
+    assert _vectorized_rows(fleet, snapshot_dir) == expected # rewritten by the run above
+    assert _snapshot_lookups() == (len(fleet), 0)
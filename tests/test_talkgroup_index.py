@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import check
+from conftest import make_codeplug
+
+
+def _facts(files):
+    facts = {}
+    check.check_files(files, check._build_profile_plan(['Gwinnett']), 'tree', talkgroup_facts=facts)
+    return facts
+
+
+def _serials(conn, table):
+    return sorted(serial for (serial,) in conn.execute(f"SELECT DISTINCT serial FROM {table}"))
+
+
+@pytest.fixture
+def index(tmp_path):
+    conn = check._open_talkgroup_index(str(tmp_path / "talkgroups.sqlite"))
+    yield conn
+    conn.close()
+
+
+def test_only_changed_and_removed_radios_are_rewritten(fleet, index):
+    assert check.update_talkgroup_index(index, fleet, _facts(fleet)) == (len(fleet), 0)
+    assert check.update_talkgroup_index(index, fleet, _facts(fleet)) == (0, 0)
+
+    with open(fleet[1], 'w', encoding='utf-8') as f: # fix the radio's alias text
+        f.write(make_codeplug(good=True, alias="UNIT 1"))
+    os.utime(fleet[1], ns=(1, 1))
+    assert check.update_talkgroup_index(index, fleet, _facts(fleet)) == (1, 0)
+    assert index.execute("SELECT alias FROM definitions WHERE serial = ?", (fleet[1][:10],)).fetchall() == [('IO 1',)]
+
+    os.remove(fleet[5])
+    with open(fleet[4], 'w', encoding='utf-8') as f:
+        f.write("<Codeplug><Recset") # could not be checked
+    remaining = fleet[:5]
+    assert check.update_talkgroup_index(index, remaining, _facts(remaining)) == (0, 2)
+    for table in ('radios', 'definitions', 'usages'):
+        assert _serials(index, table) == [filepath[:10] for filepath in fleet[:4]]
+
+
+def test_talkgroup_queries(fleet, index):
+    facts = _facts(fleet)
+    definitions, usages = facts[fleet[0]]
+    facts[fleet[0]] = (definitions, usages[:2] + [('IO 1', "SCAN LIST")]) # the one radio that uses it differently
+    check.update_talkgroup_index(index, fleet, facts)
+    serials = [filepath[:10] for filepath in fleet]
+
+    aliases = check.talkgroup_alias_conflicts(index)
+    assert aliases[['Talkgroup', 'Alias Text', 'Radios']].values.tolist() == [['IO 1', 'IO ONE', 4], ['IO 1', 'IO 1', 2]]
+    assert sorted(aliases['Serials'][1].split(', ')) == [serials[0], serials[3]]
+
+    usage = check.talkgroup_usage_differences(index)
+    assert usage['Serial'].tolist() == [serials[0]]
+    assert usage['Radios With Usual'].tolist() == [len(fleet) - 1]
+    assert "SCAN LIST" in usage['Contexts'][0] and "SCAN LIST" not in usage['Usual Contexts'][0]
+
+    lookup = check.talkgroup_lookup(index, 'IO 1')
+    assert lookup['Serial'].tolist() == serials
+    assert lookup['Alias Text'].tolist() == ['IO 1', 'IO ONE', 'IO ONE', 'IO 1', 'IO ONE', 'IO ONE']
+    assert sorted(lookup['Contexts'][0].split('; ')) == ["1-GW IO 1 (1)", "2-GW IO 2 (1)", "SCAN LIST (1)"]
+    assert check.talkgroup_lookup(index, 'NOT DEFINED').empty
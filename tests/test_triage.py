@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import check
+
+
+def _names(order):
+    return [name for name, _ in order]
+
+
+def test_likely_and_cheap_failures_go_first():
+    checks = [{'group_name': name, 'fields': {}} for name in ("Rarely Fails", "Often Fails", "Slow", "Never Seen")]
+    stats = {
+        "Rarely Fails": {'evaluations': 98, 'failures': 0, 'seconds': 0.98},
+        "Often Fails": {'evaluations': 98, 'failures': 48, 'seconds': 0.98},
+        "Slow": {'evaluations': 98, 'failures': 48, 'seconds': 98.0},
+        check.TALKGROUP_GROUP_NAME: {'evaluations': 98, 'failures': 8, 'seconds': 0.98},
+    }
+    # failure rates with one extra pass and fail: 1/2 unseen, 49/100, 9/100, 1/100; "Slow" costs 100 times more
+    assert _names(check._triage_order(checks, stats)) == ["Never Seen", "Often Fails", check.TALKGROUP_GROUP_NAME, "Rarely Fails", "Slow"]
+
+
+def test_triage_stops_at_the_first_failure(fleet):
+    order = [(group['group_name'], group) for group in check.CHECKS_TO_PERFORM] + [(check.TALKGROUP_GROUP_NAME, None)]
+    stats = {}
+    assert check.triage_xml_file(fleet[1], order, stats) == (fleet[1][:10], "FAIL", order[0][0]) # not Phase 2 capable
+    assert list(stats) == [order[0][0]]
+
+    stats = {}
+    assert check.triage_xml_file(fleet[0], order, stats) == (fleet[0][:10], "PASS", "")
+    assert stats.keys() == {name for name, _ in order}
+    assert all(s == {'evaluations': 1, 'failures': 0, 'seconds': s['seconds']} for s in stats.values())
+
+
+def test_run_learns_to_check_failing_groups_first(fleet, tmp_path, monkeypatch):
+    monkeypatch.setattr(check, 'TRIAGE_REORDER_EVERY', 1)
+    stats_path = str(tmp_path / "stats.json")
+    names = [group['group_name'] for group in check.CHECKS_TO_PERFORM] + [check.TALKGROUP_GROUP_NAME]
+    with open(stats_path, 'w', encoding='utf-8') as f: # equal, well-known costs, so this run's timings can't reorder them
+        json.dump({name: {'evaluations': 100, 'failures': 0, 'seconds': 1.0} for name in names}, f)
+    orders = []
+    triage_file = check.triage_xml_file
+    monkeypatch.setattr(check, 'triage_xml_file', lambda filepath, order, stats: orders.append(_names(order)) or triage_file(filepath, order, stats))
+
+    results = check.run_triage(fleet, stats_path)
+
+    assert results['Result'].tolist() == ["PASS", "FAIL", "FAIL", "PASS", "FAIL", "FAIL"]
+    assert orders[0][0] == check.CHECKS_TO_PERFORM[0]['group_name'] # nothing learned yet
+    learned = results['First Failure'][1]
+    assert all(order[0] == learned for order in orders[2:]) # the check that failed moved to the front...
+    assert results['First Failure'].tolist()[2:] == [learned, "", learned, learned] # ...so later radios fail at it first
+    with open(stats_path, encoding='utf-8') as f:
+        stats = json.load(f)
+    assert (stats[learned]['evaluations'], stats[learned]['failures']) == (106, 4)
+    assert all(s['evaluations'] <= 103 and s['failures'] == 0 for name, s in stats.items() if name != learned)
+
+
+def test_interrupted_run_keeps_what_it_learned(fleet, tmp_path, monkeypatch):
+    stats_path = str(tmp_path / "stats.json")
+    triage_file = check.triage_xml_file
+
+    def interrupt_on_third(filepath, order, stats):
+        if filepath == fleet[2]:
+            raise KeyboardInterrupt
+        return triage_file(filepath, order, stats)
+
+    monkeypatch.setattr(check, 'triage_xml_file', interrupt_on_third)
+    with pytest.raises(KeyboardInterrupt):
+        check.run_triage(fleet, stats_path)
+    with open(stats_path, encoding='utf-8') as f:
+        assert json.load(f)["Phase 2 Voice Capable"]['evaluations'] == 2